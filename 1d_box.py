@@ -6,16 +6,33 @@
 """
 #modified by pokky
 import numpy as np
+from matplotlib import pyplot as plt
+from schrodinger import eigen_hamiltonian
 
-def schrodinger (x):
+def schrodinger (x, k=10, method='fd2'):
     """
         Using numerical method for eigenvalue problem for Schrodinger equation.
+        x is the uniformly spaced interior grid, the walls are at x[0]-h and x[-1]+h.
+        The Hamiltonian is assembled as a tridiagonal (or banded) matrix and only
+        the lowest k levels are solved, see schrodinger.eigen_hamiltonian for method.
+        Units are hbar = m = 1, so the exact energies are n^2*pi^2/(2L^2).
+        Returns the energies and the wave functions normalized on the grid
+        (each column is one state).
     """
-    # The solution matrix 
-    M = np.zeros((len(x), len(x)))
-    for i in range(len(x)):
-        for j in range(len(x)):
-            if i == j:
-                M[i][j] = 2
-            elif i == j + 1 or i == j - 1:
-                M[i][j] = -1
\ No newline at end of file
+    h = x[1] - x[0]
+    eigenvalues, eigenvectors = eigen_hamiltonian(len(x), k=k, method=method)
+    return eigenvalues/(2*h**2), eigenvectors/np.sqrt(h)
+
+if __name__ == "__main__":
+    N = 1000
+    L = 1.0
+    x = np.linspace(0, L, N+2)[1:-1]
+    energies, psi = schrodinger(x, k=3)
+    for n in range(3):
+        exact = (n+1)**2*np.pi**2/(2*L**2)
+        print("n=%d, E=%.8f, exact=%.8f" % (n+1, energies[n], exact))
+        plt.plot(x, psi[:, n], label="n=%d" % (n+1))
+    plt.xlabel(r"$x$")
+    plt.ylabel(r"$\psi(x)$")
+    plt.legend()
+    plt.show()
@@ -0,0 +1,325 @@
+"""
+batch_runner.py
+~~~~~~~~~~~~~~~
+以設定檔批次執行求解器的參數掃描，不必為了改參數而複製一份腳本。
+設定檔為TOML或JSON，指定求解器、固定的參數、要掃描的參數(所有組合)與輸出檔，例如
+
+    solver = "heat"
+    output = "heat_sweep.npz"
+    workers = 4
+
+    [params]
+    L = 10.0
+    T0 = 40.0
+    T1 = 200.0
+    Ta = 20.0
+
+    [grid]
+    k = [0.01, 0.1, 1.0]
+    N = [100, 1000, 10000]
+    method = ["thomas", "sparse"]
+
+執行python batch_runner.py heat_sweep.toml。每一組參數為一個工作，
+以ProcessPoolExecutor同時計算，完成一個就存到檢查點目錄(預設為輸出檔名加上.parts)，
+檔名為參數(與求解器名稱)的雜湊值(eigen_cache.cache_key)。中斷後重新執行時只計算還沒有結果的工作，
+失敗的工作不存檔，下次會重試。全部完成後把結果依欄位合併成一個.npz
+(或只有純量欄位的.csv)，每一個參數與每一個結果為一欄，順序與參數組合的順序相同，
+每個工作的秒數為_seconds欄。RESERVED中的名稱保留給batch_runner使用，
+參數或求解器的結果使用這些名稱時會產生ValueError。
+相對路徑以設定檔所在的目錄為準。python batch_runner.py --list列出可用的求解器。
+root與quadrature的目標函數以expression字串給定，例如"x**4 + x**3 - 2*x**2 + x - 6"，
+可使用numpy的函數(np.exp或直接寫exp)，設定檔需為可信任的來源。
+"""
+
+import os
+import sys
+import csv
+import json
+import math
+import time
+import shutil
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from eigen_cache import cache_key
+
+try:
+    import tomllib
+except ImportError: # Python 3.11以前
+    import tomli as tomllib
+
+SOLVERS = {}
+RESERVED = ('_seconds', '_solver') # 檢查點中的秒數與雜湊時的求解器名稱
+
+def solver(name):
+    """
+    註冊求解器的裝飾器。求解器以關鍵字參數呼叫，傳回{結果名稱: 純量或陣列}。
+    必須定義在模組的最上層，才能傳給其他行程。
+    """
+    def register(func):
+        SOLVERS[name] = func
+        return func
+    return register
+
+def objective(expression):
+    """
+    將expression字串轉成函數f(x)，可使用numpy的函數。
+    """
+    namespace = {name: getattr(np, name) for name in dir(np) if not name.startswith('_')}
+    namespace.update(np=np, math=math)
+    return eval('lambda x: ' + expression, namespace)
+
+@solver('root')
+def solve_root(expression, low, high, epsilon=1e-8, method='bisect'):
+    """
+    low與high之間函數的所有根(每兩個整數之間最多一個)。
+    method為'bisect'(binary_root)、'secant'(secant_root)、'muller'(muller_root_finished)
+    或'jit'(binary_root以jit=True編譯，見jit_kernels)。
+    """
+    f = objective(expression)
+    if method == 'jit':
+        from binary_root import all_root
+        roots = all_root(f, int(low), int(high), epsilon, jit=True) or []
+    else:
+        if method == 'bisect':
+            from binary_root import all_root
+        elif method == 'secant':
+            from secant_root import all_root
+        elif method == 'muller':
+            from muller_root_finished import all_root
+        else:
+            raise ValueError("未知的找根方式: %s" % method)
+        roots = all_root(f, int(low), int(high), epsilon) or []
+    roots = np.asarray(roots, dtype=float)
+    return {'roots': roots, 'count': len(roots)}
+
+@solver('quadrature')
+def solve_quadrature(expression, a, b, n, method='simpson', exact=None):
+    """
+    f在a與b之間的積分，method為'simpson'(切成n份)或'gauss'(n個點)。
+    給定exact時另外傳回誤差。
+    """
+    from simpson_vs_gauss import simpson, gauss
+    f = objective(expression)
+    if method == 'simpson':
+        value = simpson(f, a, b, n)
+    elif method == 'gauss':
+        value = gauss(f, a, b, n)
+    else:
+        raise ValueError("未知的積分方式: %s" % method)
+    result = {'value': float(value)}
+    if exact is not None:
+        result['error'] = float(value - exact)
+    return result
+
+@solver('ode')
+def solve_ode(y0, k, c, h, xhigh, xlow=0.0):
+    """
+    人口增長模型dy/dt = ky - cy^2的有限差分解(population.ranged_finit_diff)，
+    以及與精確解(population.logistic)的最大誤差。
+    """
+    from population import ranged_finit_diff, logistic
+    y = np.asarray(ranged_finit_diff(y0, xlow, xhigh, k, c, h))
+    exact = logistic(np.arange(len(y))*h, y0, k, c)
+    return {'y': y, 'max_error': float(np.max(np.abs(y - exact)))}
+
+@solver('heat')
+def solve_heat(L, T0, T1, Ta, k, N, method='cholesky'):
+    """
+    加熱桿的溫度分布(heatconduction.heatconduction_numerical)與解析解的最大誤差。
+    """
+    from heatconduction import heatconduction_numerical, heatconduction_analytical
+    N = int(N)
+    T = heatconduction_numerical(L, T0, T1, Ta, k, N, method=method)
+    error = np.max(np.abs(T - heatconduction_analytical(L, T0, T1, Ta, k, N)))
+    return {'T': T, 'max_error': float(error)}
+
+@solver('eigen')
+def solve_eigen(N, boundary=10, V0=0.5, k=10, method='fd2', vectors=False):
+    """
+    potential_well_out_of_box.coeff_matrix_out的位能井，method為離散方式
+    (見schrodinger.eigen_hamiltonian)。vectors為True時也傳回特徵向量。
+    """
+    from schrodinger import eigen_hamiltonian, square_well
+    N = int(N)
+    V = square_well(2*N/(4*boundary+2), V0)(np.arange(N)-N/2)
+    eigenvalues, eigenvectors = eigen_hamiltonian(N, V, k=int(k), method=method)
+    result = {'eigenvalues': eigenvalues}
+    if vectors:
+        result['eigenvectors'] = eigenvectors
+    return result
+
+@solver('slit')
+def solve_slit(L, wavelength, d, points=1000, ymax=0.1):
+    """
+    單狹縫繞射在-ymax到ymax之間points個點的強度(single_slit.slit_intensity)。
+    """
+    from single_slit import slit_intensity
+    y = np.linspace(-ymax, ymax, int(points))
+    return {'y': y, 'intensity': np.array([slit_intensity(L, yi, wavelength, d) for yi in y])}
+
+def load_job(path):
+    """
+    讀取設定檔(.toml或.json)，傳回dict。
+    """
+    if path.endswith('.json'):
+        with open(path) as f:
+            job = json.load(f)
+    else:
+        with open(path, 'rb') as f:
+            job = tomllib.load(f)
+    if job.get('solver') not in SOLVERS:
+        raise ValueError("未知的求解器: %s，可用的有%s" % (job.get('solver'), sorted(SOLVERS)))
+    if 'output' not in job:
+        raise ValueError("設定檔沒有指定output")
+    reserved = sorted(set(RESERVED) & (set(job.get('params', {})) | set(job.get('grid', {}))))
+    if reserved:
+        raise ValueError("參數名稱%s保留給batch_runner使用" % reserved)
+    return job
+
+def expand_grid(params, grid):
+    """
+    固定的參數params加上grid中所有參數值的組合(依grid中的順序，最後一個變化最快)。
+    """
+    names = list(grid)
+    values = [v if isinstance(v, list) else [v] for v in grid.values()]
+    return [dict(params, **dict(zip(names, combination)))
+            for combination in itertools.product(*values)]
+
+def run_task(name, params):
+    """
+    在工作行程中執行一個工作，傳回(結果, 秒數)。
+    """
+    start = time.perf_counter()
+    result = SOLVERS[name](**params)
+    reserved = sorted(set(RESERVED) & set(result))
+    if reserved:
+        raise ValueError("求解器%s的結果名稱%s保留給batch_runner使用" % (name, reserved))
+    return result, time.perf_counter() - start
+
+def save_part(path, result, seconds):
+    """
+    將一個工作的結果存成.npz，先寫入暫存檔再改名，中斷時不會留下不完整的檔案。
+    """
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        np.savez(f, _seconds=seconds, **result)
+    os.replace(temporary, path)
+
+def load_part(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+def column(values):
+    """
+    將每個工作的同名結果合併成一欄：純量為一維陣列，形狀相同的陣列疊成多一維的陣列，
+    長度不同的一維陣列以NaN補齊(另外傳回各自的長度)。
+    """
+    arrays = [np.asarray(v) for v in values]
+    if len({a.shape for a in arrays}) == 1:
+        return np.stack(arrays), None
+    if any(a.ndim != 1 for a in arrays):
+        raise ValueError("無法合併形狀不同的多維陣列")
+    lengths = np.array([len(a) for a in arrays])
+    padded = np.full((len(arrays), max(lengths.max(), 1)), np.nan)
+    for row, a in zip(padded, arrays):
+        row[:len(a)] = a
+    return padded, lengths
+
+def collect(tasks, results):
+    """
+    將參數與結果依欄位合併成{欄位名稱: 陣列}。
+    """
+    columns = {}
+    for name in dict.fromkeys(key for task in tasks for key in task):
+        columns[name] = np.array([task.get(name) for task in tasks])
+    for name in dict.fromkeys(key for result in results for key in result):
+        values, lengths = column([result.get(name, np.nan) for result in results])
+        columns[name] = values
+        if lengths is not None:
+            columns[name + '_length'] = lengths
+    return columns
+
+def write_output(path, columns):
+    """
+    寫出合併後的結果。.npz包含所有欄位；.csv只包含純量的欄位。
+    """
+    if path.endswith('.csv'):
+        names = [name for name, values in columns.items() if values.ndim == 1]
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(names)
+            writer.writerows(zip(*(columns[name].tolist() for name in names)))
+    else:
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            np.savez(f, **columns)
+        os.replace(temporary, path)
+
+def run_job(path, workers=None, output=None, fresh=False, log=print):
+    """
+    執行設定檔path中的所有工作(已有檢查點的工作略過)，寫出合併的結果。
+    workers與output可覆蓋設定檔中的值；fresh為True時先刪除之前的檢查點。
+    傳回(欄位的dict, 失敗的工作數)；有工作失敗時不寫出合併的結果，columns為None。
+    """
+    job = load_job(path)
+    base = os.path.dirname(os.path.abspath(path))
+    output = os.path.join(base, output or job['output'])
+    checkpoint = os.path.join(base, job.get('checkpoint', output + '.parts'))
+    workers = workers or job.get('workers', os.cpu_count())
+    if fresh and os.path.isdir(checkpoint):
+        shutil.rmtree(checkpoint)
+    os.makedirs(checkpoint, exist_ok=True)
+
+    name = job['solver']
+    tasks = expand_grid(job.get('params', {}), job.get('grid', {}))
+    parts = [os.path.join(checkpoint, cache_key(_solver=name, **task) + '.npz') for task in tasks]
+    pending = [i for i, part in enumerate(parts) if not os.path.exists(part)]
+    log("%s：共%d個工作，%d個已完成，%d個行程" % (name, len(tasks), len(tasks)-len(pending), workers))
+
+    failed = 0
+    if pending:
+        pool = ProcessPoolExecutor(workers)
+        try:
+            futures = {pool.submit(run_task, name, tasks[i]): i for i in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                try:
+                    result, seconds = future.result()
+                except Exception as error:
+                    failed += 1
+                    log("工作%d %s失敗：%r" % (i, tasks[i], error))
+                    continue
+                save_part(parts[i], result, seconds)
+                log("[%d/%d] 工作%d完成，%.3f秒" % (done, len(pending), i, seconds))
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            log("已中斷，完成的工作已存在%s，重新執行即可繼續" % checkpoint)
+            raise
+        pool.shutdown()
+    if failed:
+        log("%d個工作失敗，沒有寫出%s；重新執行時只會重試失敗的工作" % (failed, output))
+        return None, failed
+    columns = collect(tasks, [load_part(part) for part in parts])
+    write_output(output, columns)
+    log("結果已寫入%s" % output)
+    return columns, 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以設定檔批次執行求解器的參數掃描")
+    parser.add_argument('job', nargs='?', help="設定檔(.toml或.json)")
+    parser.add_argument('-w', '--workers', type=int, help="行程數，覆蓋設定檔中的workers")
+    parser.add_argument('-o', '--output', help="輸出檔(.npz或.csv)，覆蓋設定檔中的output")
+    parser.add_argument('--fresh', action='store_true', help="刪除之前的檢查點，全部重新計算")
+    parser.add_argument('--list', action='store_true', help="列出可用的求解器")
+    args = parser.parse_args(argv)
+    if args.list or args.job is None:
+        for name, func in SOLVERS.items():
+            print("%-12s %s" % (name, func.__doc__.strip().splitlines()[0]))
+        return 0
+    columns, failed = run_job(args.job, args.workers, args.output, args.fresh)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+benchmark_suite.py
+~~~~~~~~~~~~~~~~~~
+各個數值子系統的效能基準：找根、找極值、積分、常微分方程式、邊界值問題、
+特徵值問題與矩陣的組裝，每一個項目以數個問題大小計時。
+除了每一次呼叫的秒數，也以tracemalloc記錄記憶體用量的峰值，
+並以log(秒數)對log(問題大小)的斜率估計複雜度的次方，
+超過預期的次方(例如O(N)的組裝退化成O(N^2))即標示出來。
+結果可存成基準檔(JSON)，之後的執行與基準比較，
+變慢或記憶體增加超過threshold的項目標示為退步，並以非零的結束碼結束。
+
+    python benchmark_suite.py --save          # 建立基準
+    python benchmark_suite.py                 # 與基準比較
+    python benchmark_suite.py --filter heat   # 只執行名稱包含heat的項目
+
+不同的電腦速度不同，基準檔只適合與同一台電腦的結果比較，
+因此預設的benchmark_baseline.json不放進git(見.gitignore)。
+同一台電腦的速度也會隨負載改變，因此每次執行時另外計時一個固定的參考工作(calibration)，
+與基準比較時先除以參考工作的速度比。
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import numpy as np
+
+CASES = {}
+
+def benchmark(name, sizes, exponent=None):
+    """
+    註冊一個基準項目的裝飾器。被裝飾的函數setup(n)準備大小為n的問題，
+    傳回不需要參數的函數(實際計時的部分)。
+    exponent為預期的複雜度次方，None代表不檢查。
+    """
+    def register(setup):
+        CASES[name] = {'setup': setup, 'sizes': tuple(sizes), 'exponent': exponent}
+        return setup
+    return register
+
+@benchmark('root.bisect', (100, 1000, 10000), exponent=1)
+def root_bisect(n):
+    from binary_root import all_root, test_case
+    return lambda: all_root(test_case, -n, n, 1e-8)
+
+@benchmark('root.secant', (100, 1000, 10000), exponent=1)
+def root_secant(n):
+    from secant_root import all_root, test_case
+    return lambda: all_root(test_case, -n, n, 1e-8)
+
+@benchmark('root.muller', (100, 1000, 10000), exponent=1)
+def root_muller(n):
+    from muller_root_finished import all_root, test_case
+    return lambda: all_root(test_case, -n, n, 1e-8)
+
+@benchmark('extremum.bisect', (10, 100, 1000), exponent=1)
+def extremum_bisect(n):
+    """
+    n個不同區間的極值搜尋(每次的迭代次數固定，總時間與n成正比)。
+    """
+    from local_extreme_bisect import local_extreme
+    centers = np.linspace(-5, 5, n)
+    def run():
+        for c in centers:
+            local_extreme(lambda x: -(x-c)**2 + 1, c-10, c+9, 1e-10, 200)
+    return run
+
+@benchmark('extremum.golden', (10, 100, 1000), exponent=1)
+def extremum_golden(n):
+    from local_extreme_golden import local_minima_golden
+    centers = np.linspace(-5, 5, n)
+    def run():
+        for c in centers:
+            local_minima_golden(lambda x: (x-c)**2 + 1, c-10, c+9, 1e-10, 200)
+    return run
+
+@benchmark('quadrature.simpson', (10**4, 10**5, 10**6), exponent=1)
+def quadrature_simpson(n):
+    from simpson_vs_gauss import simpson, f
+    return lambda: simpson(f, 0, 10, n)
+
+@benchmark('quadrature.gauss', (10, 100, 1000))
+def quadrature_gauss(n):
+    # leggauss求節點需要解特徵值問題，不是簡單的次方關係，不檢查
+    from simpson_vs_gauss import gauss, f
+    return lambda: gauss(f, 0, 10, n)
+
+@benchmark('quadrature.slit', (10, 40, 160), exponent=1)
+def quadrature_slit(n):
+    from single_slit import slit_intensity
+    y = np.linspace(-0.1, 0.1, n)
+    return lambda: [slit_intensity(2, yi, 630, 0.1) for yi in y]
+
+@benchmark('ode.finite_difference', (10**3, 10**4, 10**5), exponent=1)
+def ode_finite_difference(n):
+    from population import ranged_finit_diff
+    return lambda: ranged_finit_diff(1, 0, 50, 0.1, 0.01, 50/n)
+
+# cg的預條件子為DST-I，長度2(N+1)的FFT在N+1有大質因數時慢很多倍(例如10^6+1 = 101*9901)，
+# 因此取N+1為2的次方
+for method, sizes in (('banded', (10**4, 10**5, 10**6)), ('sparse', (10**4, 10**5, 10**6)),
+                      ('cg', (2**13-1, 2**16-1, 2**19-1)), ('cholesky', (10**4, 10**5, 10**6)),
+                      ('thomas', (10**3, 10**4, 10**5))):
+    def heat(n, method=method):
+        from heatconduction import heatconduction_numerical
+        return lambda: heatconduction_numerical(10.0, 40.0, 200.0, 20.0, 0.01, n, method=method)
+    benchmark('bvp.heat_' + method, sizes, exponent=1)(heat)
+
+@benchmark('assembly.heat_matrix', (10**4, 10**5, 10**6), exponent=1)
+def assembly_heat_matrix(n):
+    """
+    係數矩陣的組裝(每次先清除fd_operator的快取)，O(N^2)的組裝在這裡最明顯。
+    """
+    import fd_operator
+    from heatconduction import coefficient_matrix
+    def run():
+        fd_operator.clear_cache()
+        coefficient_matrix(n, 0.01, 10/(n+1), 20.0)
+    return run
+
+@benchmark('eigen.coeff_matrix', (1000, 4000, 16000), exponent=1)
+def eigen_coeff_matrix(n):
+    from potential_well import coeff_matrix
+    return lambda: coeff_matrix(n, k=10)
+
+@benchmark('eigen.coeff_matrix_out', (1000, 4000, 16000), exponent=1)
+def eigen_coeff_matrix_out(n):
+    from potential_well import coeff_matrix_out
+    return lambda: coeff_matrix_out(n, boundary=5, V0=0.1, k=10)
+
+def timing(func, repeat=5, min_time=0.1):
+    """
+    每次計時連續呼叫number次(number使每次至少min_time秒)，
+    傳回repeat次中最快的每次呼叫秒數。
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 10**6:
+            break
+        number *= max(2, min(10, int(min_time/max(elapsed, 1e-9))))
+    best = elapsed/number
+    for _ in range(repeat-1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start)/number)
+    return best
+
+def reference_work():
+    """
+    固定的參考工作：Python迴圈與numpy的陣列運算各一半。
+    """
+    total = 0.0
+    for i in range(20000):
+        total += i*0.5
+    x = np.random.default_rng(0).standard_normal(20000)
+    return total + np.sort(x)[0] + np.sum(np.exp(-x**2))
+
+def calibration(repeat=5):
+    """
+    參考工作每次呼叫的秒數。
+    """
+    return timing(reference_work, repeat)
+
+def peak_memory(func):
+    """
+    以tracemalloc量測一次呼叫的記憶體用量峰值(位元組，numpy陣列也包含在內)。
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def scaling_exponent(sizes, seconds):
+    """
+    log(秒數)對log(問題大小)的最小平方斜率。
+    """
+    return float(np.polyfit(np.log(sizes), np.log(seconds), 1)[0])
+
+def run_case(name, repeat=5, min_time=0.1, sizes=None):
+    """
+    執行一個基準項目，傳回{'sizes': {n: {'seconds', 'peak_bytes'}}, 'exponent', 'expected'}。
+    """
+    case = CASES[name]
+    results = {}
+    for n in sizes or case['sizes']:
+        func = case['setup'](n)
+        func() # 第一次呼叫(載入模組、建立快取)不計時
+        results[str(n)] = {'seconds': timing(func, repeat, min_time), 'peak_bytes': peak_memory(func)}
+    ns = [int(n) for n in results]
+    exponent = scaling_exponent(ns, [r['seconds'] for r in results.values()]) if len(ns) > 1 else None
+    return {'sizes': results, 'exponent': exponent, 'expected': case['exponent']}
+
+def fastest(first, second):
+    """
+    合併同一個項目的兩次結果，每個大小取較快的秒數與較小的記憶體峰值，重新計算次方。
+    """
+    results = {n: {'seconds': min(r['seconds'], second['sizes'][n]['seconds']),
+                   'peak_bytes': min(r['peak_bytes'], second['sizes'][n]['peak_bytes'])}
+               for n, r in first['sizes'].items()}
+    ns = [int(n) for n in results]
+    exponent = scaling_exponent(ns, [r['seconds'] for r in results.values()]) if len(ns) > 1 else None
+    return dict(first, sizes=results, exponent=exponent)
+
+def compare(name, result, baseline, threshold=0.25, exponent_slack=0.35, speed=1.0):
+    """
+    傳回退步的說明(list)：複雜度次方超過預期加上exponent_slack，
+    秒數與基準的比值(各個大小的幾何平均)超過1 + threshold，
+    或任一個大小的記憶體峰值超過基準的(1 + threshold)倍。
+    speed為這次與基準的參考工作秒數比，秒數的比值先除以speed。
+    秒數取幾何平均是因為單一大小的計時容易受到其他程式的干擾，
+    真正的退步通常所有大小都會變慢；只有大的問題變慢則由複雜度次方檢查。
+    """
+    problems = []
+    expected, exponent = result['expected'], result['exponent']
+    if expected is not None and exponent is not None and exponent > expected + exponent_slack:
+        problems.append("複雜度次方%.2f，預期%.2f" % (exponent, expected))
+    reference = (baseline or {}).get(name)
+    if reference:
+        common = [n for n in result['sizes'] if n in reference['sizes']]
+        if common:
+            ratios = [result['sizes'][n]['seconds']/reference['sizes'][n]['seconds'] for n in common]
+            ratio = float(np.exp(np.mean(np.log(ratios))))/speed
+            if ratio > 1 + threshold:
+                problems.append("變慢%.0f%%" % (100*(ratio - 1)))
+        for n in common:
+            current, old = result['sizes'][n], reference['sizes'][n]
+            if current['peak_bytes'] > old['peak_bytes']*(1 + threshold) + 4096:
+                problems.append("n=%s記憶體增加%.0f%%"
+                                % (n, 100*(current['peak_bytes']/max(old['peak_bytes'], 1) - 1)))
+    return problems
+
+def machine():
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'processor': platform.processor()}
+
+def format_bytes(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024 or unit == 'GB':
+            return "%.0f%s" % (n, unit) if unit == 'B' else "%.1f%s" % (n, unit)
+        n /= 1024
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="數值子系統的效能基準")
+    parser.add_argument('--baseline', default='benchmark_baseline.json', help="基準檔")
+    parser.add_argument('--save', action='store_true', help="把這次的結果存成基準")
+    parser.add_argument('--threshold', type=float, default=0.25, help="變慢超過此比例視為退步")
+    parser.add_argument('--filter', default='', help="只執行名稱包含此字串的項目")
+    parser.add_argument('--repeat', type=int, default=5, help="每個大小計時的次數(取最快)")
+    parser.add_argument('--retries', type=int, default=2, help="退步的項目重新計時的次數")
+    parser.add_argument('--quick', action='store_true', help="每個項目只執行最小的兩個大小")
+    parser.add_argument('--list', action='store_true', help="列出所有項目")
+    args = parser.parse_args(argv)
+
+    names = [name for name in CASES if args.filter in name]
+    if args.list:
+        for name in names:
+            print("%-28s 大小%s 預期次方%s" % (name, CASES[name]['sizes'], CASES[name]['exponent']))
+        return 0
+    try:
+        with open(args.baseline) as f:
+            saved = json.load(f)
+        baseline = saved['cases']
+    except FileNotFoundError:
+        saved, baseline = {}, None
+    reference = calibration()
+    speed = reference/saved.get('calibration', reference)
+    print("參考工作%.3g秒(基準的%.2f倍)" % (reference, speed))
+
+    results, regressions = {}, {}
+    for name in names:
+        sizes = CASES[name]['sizes'][:2] if args.quick else None
+        result = run_case(name, args.repeat, sizes=sizes)
+        reference_cases = None if args.save else baseline # --save時只檢查複雜度次方
+        problems = compare(name, result, reference_cases, args.threshold, speed=speed)
+        for _ in range(args.retries if problems else 0):
+            # 短暫的干擾只會讓其中一次變慢，重新計時後取較快的結果再比較一次
+            result = fastest(result, run_case(name, args.repeat, sizes=sizes))
+            problems = compare(name, result, reference_cases, args.threshold, speed=speed)
+            if not problems:
+                break
+        results[name] = result
+        if problems:
+            regressions[name] = problems
+        timings = '  '.join("n=%s %.3g秒 %s" % (n, r['seconds'], format_bytes(r['peak_bytes']))
+                            for n, r in result['sizes'].items())
+        exponent = '-' if result['exponent'] is None else '%.2f' % result['exponent']
+        print("%-28s 次方%5s  %s%s" % (name, exponent, timings,
+                                       "  <-- " + "；".join(problems) if problems else ''))
+
+    if args.save:
+        previous = baseline or {}
+        previous.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': machine(), 'calibration': reference, 'cases': previous}, f, indent=1)
+        print("基準已存到%s" % args.baseline)
+    elif baseline is None:
+        print("沒有基準檔%s，只檢查複雜度次方(以--save建立基準)" % args.baseline)
+    if regressions:
+        print("%d個項目退步：%s" % (len(regressions), ', '.join(regressions)))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,29 +4,40 @@
     註: 如果兩個整數之間有超過一個根，那這支沒辦法解。
     Chang Kai-Po @ Jian Lab 2023/03/03
 """
+from instrument import instrument
+from jit_kernels import run
 
 def test_case (x):  #用來測試的函數
     y = x**4 + x**3 - 2*x**2 + x - 6
     return y
 
-def find_integer (f, low, high):
+def find_integer (f, low, high, jit=False):
     """
       以low為下界，high為上界，搜尋函數f(x)在那些整數間可能會有根
       之後，傳回所有可能會有根的整數下緣
       (例如說如果有根在2-3之間與7-8之間則傳回[2,7])
+      jit=True時以numba編譯迴圈與f(見jit_kernels)。
     """
+    return run(integer_loop, f, low, high, jit=jit)
+
+def integer_loop (f, low, high):
+    """ find_integer的迴圈 """
     li = []         #放一個空array填解
     for i in range(low, high):
         if f(i)*f(i+1) < 0:
             li.append(i);
     return li
 
-def one_root (f, i, epsilon):
+def one_root (f, i, epsilon, jit=False):
     """
       !!除了單元測試用途以外，請不要直接呼叫這個函數!!
       在已經知道函數f在i與i+1之間有一個根的前提下，
       用二分法逼近出這個根在哪裡，精度為epsilon。    
     """
+    return run(bisect_loop, f, i, epsilon, jit=jit)
+
+def bisect_loop (f, i, epsilon):
+    """ one_root的迴圈 """
     low, mid, high = float(i), float(i)+0.5, float(i)+1
     while (high - low) > epsilon:
         if f(low)*f(mid) < 0:          #根在下半，故異號
@@ -37,19 +48,21 @@ def one_root (f, i, epsilon):
             mid = (high + low) / 2
     return low                         #以下界為根 
 
-def all_root (f, low, high, epsilon):
+@instrument(count='f')
+def all_root (f, low, high, epsilon, jit=False):
     """
       以low為下界, high為上界，搜尋函數f(x)在這個範圍內可能的根，
-      精度為epsilon。      
+      精度為epsilon。jit=True時以numba編譯迴圈與f(見jit_kernels)。
     """
-    introot = find_integer (f, low, high)      #搜尋函數f(x)在那些整數間可能會有根。
+    introot = find_integer (f, low, high, jit)      #搜尋函數f(x)在那些整數間可能會有根。
     #print(introot)
     li = []
     if not introot:
         return;                                #如果這範圍沒有，就結束
     for item in introot:
-        li.append(one_root (f, item, epsilon))
+        li.append(one_root (f, item, epsilon, jit))
     return li
 
-print("函數 x^4 + x^3 - 2*x^2 + x - 6 \n 在-20與20之間的根可能有:\n");
-print(all_root(test_case, -20, 20, 0.0001))
\ No newline at end of file
+if __name__ == '__main__':
+    print("函數 x^4 + x^3 - 2*x^2 + x - 6 \n 在-20與20之間的根可能有:\n");
+    print(all_root(test_case, -20, 20, 0.0001))
\ No newline at end of file
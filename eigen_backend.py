@@ -0,0 +1,201 @@
+"""
+eigen_backend.py
+~~~~~~~~~~~~~~~~
+特徵值與線性方程式求解的後端。
+同一個對稱矩陣(scipy稀疏矩陣或numpy陣列)可以交給不同的函式庫求解：
+'numpy'為稠密的np.linalg；'scipy'依矩陣的頻寬選擇三對角(eigh_tridiagonal)、
+窄帶狀(eig_banded，例如高階差分)或稀疏(shift-invert eigsh)的解法；'pyarma'為Armadillo的eig_sym(稠密)。
+後端在第一次使用時才載入，沒有安裝的函式庫不影響其他後端。
+未指定後端時使用環境變數NP_EIGEN_BACKEND，預設為'scipy'，
+例如 NP_EIGEN_BACKEND=pyarma python potential_well.py 不需要修改任何程式。
+benchmark在相同的Hamiltonian上比較各後端的速度與結果。
+"""
+
+import os
+import time
+from functools import lru_cache
+import numpy as np
+from scipy.sparse import issparse, diags
+
+DEFAULT_BACKEND = 'scipy'
+
+class Backend:
+    """
+    一個後端：eigh(H, k)傳回最小的k個特徵值(由小到大)與特徵向量(每一行)，
+    solve(A, b)傳回Ax = b的解。H、A可為scipy稀疏矩陣或numpy陣列。
+    """
+    def __init__(self, name, eigh, solve):
+        self.name = name
+        self.eigh = eigh
+        self.solve = solve
+
+def dense(A):
+    """
+    轉成稠密的numpy陣列。
+    """
+    return A.toarray() if issparse(A) else np.asarray(A, dtype=float)
+
+def bandwidth(A):
+    """
+    矩陣的半頻寬max|i-j|(只計算非零元素)。
+    """
+    if issparse(A):
+        A = A.tocoo()
+        rows, cols = A.row[A.data != 0], A.col[A.data != 0]
+    else:
+        rows, cols = np.nonzero(A)
+    return int(np.max(np.abs(rows-cols))) if len(rows) else 0
+
+def load_numpy():
+    def eigh(H, k):
+        eigenvalues, eigenvectors = np.linalg.eigh(dense(H))
+        return eigenvalues[:k], eigenvectors[:, :k]
+    def solve(A, b):
+        return np.linalg.solve(dense(A), b)
+    return Backend('numpy', eigh, solve)
+
+def load_scipy():
+    from scipy.linalg import eigh_tridiagonal, eig_banded, eigh as dense_eigh, solve as dense_solve
+    from scipy.sparse.linalg import eigsh, spsolve
+    def eigh(H, k):
+        N = H.shape[0]
+        m = bandwidth(H)
+        if m <= 1:
+            d = H.diagonal()
+            e = H.diagonal(1) if issparse(H) else np.diagonal(H, 1)
+            return eigh_tridiagonal(d, e, select='i', select_range=(0, k-1))
+        if m <= 16:
+            # 上帶狀格式：ab[m-j, i+j] = H[i, i+j]
+            ab = np.zeros((m+1, N))
+            for j in range(m+1):
+                ab[m-j, j:] = H.diagonal(j) if issparse(H) else np.diagonal(H, j)
+            return eig_banded(ab, select='i', select_range=(0, k-1))
+        if not issparse(H) or k >= N-1:
+            return dense_eigh(dense(H), subset_by_index=(0, k-1))
+        # Gershgorin下界作為shift，最接近的k個即為最小的k個
+        H = H.tocsr()
+        radius = np.asarray(abs(H).sum(axis=1)).ravel() - np.abs(H.diagonal())
+        sigma = np.min(H.diagonal() - radius) - 1.0
+        # ARPACK預設以隨機向量開始，幾乎簡併的態每次可能得到不同的組合；固定初始向量才可重現
+        v0 = np.random.default_rng(0).standard_normal(N)
+        eigenvalues, eigenvectors = eigsh(H, k=k, sigma=sigma, which='LM', v0=v0)
+        order = np.argsort(eigenvalues)
+        return eigenvalues[order], eigenvectors[:, order]
+    def solve(A, b):
+        if issparse(A):
+            return spsolve(A.tocsc(), b)
+        return dense_solve(dense(A), b)
+    return Backend('scipy', eigh, solve)
+
+def load_pyarma():
+    import pyarma as pa
+    def eigh(H, k):
+        eigval, eigvec = pa.mat(), pa.mat()
+        if not pa.eig_sym(eigval, eigvec, pa.mat(dense(H))):
+            raise np.linalg.LinAlgError("pyarma.eig_sym沒有收斂")
+        return np.array(eigval).ravel()[:k], np.array(eigvec)[:, :k]
+    def solve(A, b):
+        x = pa.solve(pa.mat(dense(A)), pa.mat(np.asarray(b, dtype=float).reshape(len(b), -1)))
+        return np.array(x).reshape(np.shape(b))
+    return Backend('pyarma', eigh, solve)
+
+# 名稱 -> 載入函數，register_backend可以加入其他後端
+LOADERS = {'numpy': load_numpy, 'scipy': load_scipy, 'pyarma': load_pyarma}
+
+def register_backend(name, loader):
+    """
+    加入一個後端，loader為不需要參數、傳回Backend的函數(第一次使用時才呼叫)。
+    """
+    LOADERS[name] = loader
+    load_backend.cache_clear()
+
+def backend_name(name=None):
+    """
+    實際使用的後端名稱：name，或環境變數NP_EIGEN_BACKEND，或DEFAULT_BACKEND。
+    """
+    return name or os.environ.get('NP_EIGEN_BACKEND') or DEFAULT_BACKEND
+
+@lru_cache(maxsize=None)
+def load_backend(name):
+    """
+    載入名稱為name的後端並快取，套件沒有安裝時丟出ImportError。
+    """
+    if name not in LOADERS:
+        raise ValueError("未知的後端: %s(可用的有%s)" % (name, ', '.join(LOADERS)))
+    try:
+        return LOADERS[name]()
+    except ImportError as error:
+        raise ImportError("後端%s需要的套件沒有安裝: %s" % (name, error))
+
+def get_backend(name=None):
+    """
+    傳回後端(Backend)，name見backend_name。同一個後端只載入一次。
+    """
+    return load_backend(backend_name(name))
+
+def available_backends():
+    """
+    可以載入的後端名稱。
+    """
+    names = []
+    for name in LOADERS:
+        try:
+            load_backend(name)
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+def eigen_lowest(H, k=10, backend=None):
+    """
+    求對稱矩陣H最小的k個特徵值與特徵向量，後端見get_backend。
+    傳回值的格式與schrodinger.eigen_tridiagonal相同(特徵向量的正負號已統一)。
+    """
+    from schrodinger import fix_sign
+    k = min(k, H.shape[0])
+    eigenvalues, eigenvectors = get_backend(backend).eigh(H, k)
+    return np.asarray(eigenvalues), fix_sign(np.asarray(eigenvectors))
+
+def linear_solve(A, b, backend=None):
+    """
+    求解Ax = b，後端見get_backend。
+    """
+    return get_backend(backend).solve(A, b)
+
+def benchmark(Ns=(256, 576, 1024, 2025), k=10, backends=None, repeat=3):
+    """
+    在相同的Hamiltonian上比較各後端求最小k個態的時間，每一個取repeat次中最快的一次：
+    '1d'為一維有限深方形井(三對角，見schrodinger.hamiltonian_tridiagonal)，
+    '2d'為sqrt(N) x sqrt(N)的二維方形量子點(稀疏，見schrodinger_nd.hamiltonian_nd)。
+    與scipy的結果比較最大的特徵值差異，確認各後端給出相同的能譜。
+    傳回{(後端, 問題, N): (秒, 最大差異)}。
+    """
+    from schrodinger import hamiltonian_tridiagonal, square_well
+    from schrodinger_nd import hamiltonian_nd
+    backends = available_backends() if backends is None else backends
+    results = {}
+    for N in Ns:
+        V = square_well(N/2, 0.01)(np.arange(N)-N/2)
+        d, e = hamiltonian_tridiagonal(N, V)
+        n = int(np.sqrt(N))
+        axis = np.arange(n) - n/2
+        well = square_well(n/2, 0.01)
+        problems = {'1d': diags([e, d, e], [-1, 0, 1], format='csr'),
+                    '2d': hamiltonian_nd((axis, axis), well(axis)[:, None] + well(axis)[None, :],
+                                         mass=1.0, hbar=np.sqrt(2))}
+        for problem, H in problems.items():
+            reference = eigen_lowest(H, k, backend='scipy')[0]
+            for name in backends:
+                best = np.inf
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    eigenvalues = eigen_lowest(H, k, backend=name)[0]
+                    best = min(best, time.perf_counter()-start)
+                results[name, problem, H.shape[0]] = (best, np.max(np.abs(eigenvalues-reference)))
+    return results
+
+if __name__ == '__main__':
+    print("可用的後端:", ', '.join(available_backends()))
+    results = benchmark()
+    for (name, problem, N), (seconds, error) in results.items():
+        print("%-8s %s N=%5d  %9.5f 秒  與scipy的最大差異 %.2e" % (name, problem, N, seconds, error))
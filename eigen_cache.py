@@ -0,0 +1,145 @@
+"""
+eigen_cache.py
+~~~~~~~~~~~~~~
+特徵值問題結果的快取。
+同樣的Hamiltonian(相同的N、位能參數、差分方式與後端)只需要對角化一次：
+key為這些參數內容的雜湊值，結果先放在記憶體中的LRU快取，
+若指定目錄則同時存到硬碟，特徵值為.npy，特徵向量為.npy並以memmap讀取，
+下次執行時只需要幾毫秒就能載入。硬碟上的快取超過max_bytes時，
+刪除最久沒有使用的結果。
+"""
+
+import os
+import json
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+def cache_key(**params):
+    """
+    由參數的內容計算key(SHA-1的十六進位字串)，參數的順序不影響結果。
+    數字、字串、tuple等以JSON表示，numpy陣列以形狀、型別與內容的bytes表示，
+    因此直接傳入位能陣列也可以。
+    """
+    digest = hashlib.sha1()
+    for name in sorted(params):
+        value = params[name]
+        digest.update(name.encode())
+        if isinstance(value, np.ndarray):
+            value = np.ascontiguousarray(value)
+            digest.update(("%s%s" % (value.dtype, value.shape)).encode())
+            digest.update(value.tobytes())
+        else:
+            digest.update(json.dumps(value, sort_keys=True, default=repr).encode())
+    return digest.hexdigest()
+
+class EigenCache:
+    """
+    特徵值與特徵向量的兩層快取。
+    memory_items為記憶體中最多保留的結果數(LRU)；
+    directory為硬碟快取的目錄，None代表只使用記憶體；
+    max_bytes為硬碟快取的大小上限。
+    hits與misses記錄命中與未命中的次數。
+    """
+    def __init__(self, directory=None, memory_items=32, max_bytes=2**30):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def paths(self, key):
+        """
+        key在硬碟上的特徵值與特徵向量檔名。
+        """
+        return (os.path.join(self.directory, key + '_values.npy'),
+                os.path.join(self.directory, key + '_vectors.npy'))
+
+    def get(self, key):
+        """
+        傳回(特徵值, 特徵向量)，沒有快取時傳回None。
+        從硬碟載入的特徵向量是唯讀的memmap。
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.directory is None:
+            return None
+        values_path, vectors_path = self.paths(key)
+        try:
+            result = np.load(values_path), np.load(vectors_path, mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(vectors_path) # 更新修改時間，作為LRU的依據
+        self.remember(key, result)
+        return result
+
+    def put(self, key, eigenvalues, eigenvectors):
+        """
+        存入一個結果，硬碟上先寫入暫存檔再改名，中斷時不會留下不完整的檔案。
+        傳回存入的(特徵值, 特徵向量)；快取太小時結果可能立刻被移出，不能再由快取讀回。
+        """
+        result = np.asarray(eigenvalues), np.asarray(eigenvectors)
+        self.remember(key, result)
+        if self.directory is None:
+            return result
+        for path, array in zip(self.paths(key), result):
+            temporary = path + '.tmp'
+            with open(temporary, 'wb') as f:
+                np.save(f, array)
+            os.replace(temporary, path)
+        self.evict()
+        return result
+
+    def remember(self, key, result):
+        self.memory[key] = result
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def evict(self):
+        """
+        硬碟快取超過max_bytes時，依特徵向量檔的修改時間刪除最舊的結果。
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('_vectors.npy'):
+                key = name[:-len('_vectors.npy')]
+                paths = self.paths(key)
+                size = sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+                entries.append((os.path.getmtime(paths[1]), size, key))
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in self.paths(key):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.memory.pop(key, None)
+            total -= size
+
+    def solve(self, compute, **params):
+        """
+        以params計算key，有快取時直接傳回，否則呼叫compute()求解並存入快取。
+        compute需傳回(特徵值, 特徵向量)。
+        """
+        key = cache_key(**params)
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        return self.put(key, *compute())
+
+    def clear(self):
+        """
+        清除記憶體與硬碟上的所有結果。
+        """
+        self.memory.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith('.npy'):
+                    os.remove(os.path.join(self.directory, name))
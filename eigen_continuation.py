@@ -0,0 +1,175 @@
+"""
+eigen_continuation.py
+~~~~~~~~~~~~~~~~~~~~~
+能階隨參數變化(例如位能井的深度V0或寬度)的連續求解。
+相鄰兩個參數的特徵向量幾乎相同，因此每一步以前一步的特徵向量作為LOBPCG的初始值，
+只需要幾次迭代；不收斂時才改用eigen_backend的直接解法。
+能階依特徵向量的重疊程度(匈牙利演算法)對應到前一步的能階，
+能階交錯時也能追蹤同一個態，而不是單純依大小排序。
+參數可以分成數段，在不同的行程中同時計算，最後再把各段接起來。
+Hamiltonian的建立函數builder(p)必須定義在模組的最上層(或為functools.partial)，
+才能傳給其他行程。
+"""
+
+import time
+import warnings
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import diags
+from scipy.sparse.linalg import lobpcg
+from matplotlib import pyplot as plt
+from eigen_backend import bandwidth, eigen_lowest
+from schrodinger import square_well
+from schrodinger_nd import hamiltonian_nd
+from fd_operator import laplacian
+
+def square_well_hamiltonian(V0, N=1000, boundary=10, width=None):
+    """
+    potential_well.coeff_matrix_out的Hamiltonian(三對角，CSR)，
+    width為井寬佔的格點數，預設與coeff_matrix_out相同。
+    """
+    width = 2*N/(4*boundary+2) if width is None else width
+    return laplacian(N) + diags(square_well(width, V0)(np.arange(N)-N/2), format='csr')
+
+def rectangular_dot_hamiltonian(aspect, n=40, V0=1.0):
+    """
+    二維長方形量子點(n x n格點，Kronecker和)，寬為n/2，高為aspect*n/2。
+    改變aspect時x方向與y方向的激發態會互相交錯。
+    """
+    axis = np.arange(n) - n/2.0
+    X, Y = np.meshgrid(axis, axis, indexing='ij')
+    V = np.where((np.abs(X) < n/4) & (np.abs(Y) < aspect*n/4), 0.0, V0)
+    # 格距為1、hbar^2/2m = 1，與一維的[-1, 2, -1]相同
+    return hamiltonian_nd((axis, axis), V, mass=1.0, hbar=np.sqrt(2))
+
+def match_levels(previous, vectors, previous_energies=None, energies=None, tie=1e-3,
+                 degenerate=1e-8):
+    """
+    依重疊|<previous_i|vectors_j>|找出最佳的一對一對應(linear_sum_assignment)。
+    傳回排列order，使vectors[:, order]的第i行對應previous的第i行。
+    給定能量時另外處理簡併與幾乎簡併的態，結果才不受求解器任意選取的基底影響：
+    前一步能量相同(相對差小於degenerate)的態可在子空間內任意旋轉，
+    重疊改用新的態在整個簡併子空間上投影的長度，子空間內再依能量由低到高對應；
+    重疊相近(差距小於tie)時，成本另外加上tie乘以能量差(除以最大的能量差)，選能量較近的。
+    """
+    overlap = np.abs(previous.T @ vectors)
+    clusters = []
+    if previous_energies is not None and energies is not None:
+        scale = max(np.max(np.abs(previous_energies)), 1e-300)
+        sorted_rows = np.argsort(previous_energies)
+        breaks = np.flatnonzero(np.diff(previous_energies[sorted_rows]) > degenerate*scale) + 1
+        clusters = [c for c in np.split(sorted_rows, breaks) if len(c) > 1]
+        for cluster in clusters:
+            overlap[cluster] = np.sqrt(np.sum(overlap[cluster]**2, axis=0))
+        gap = np.abs(np.subtract.outer(previous_energies, energies))
+        overlap = overlap - tie*gap/max(np.max(gap), 1e-300)
+    rows, cols = linear_sum_assignment(-overlap)
+    order = cols[np.argsort(rows)]
+    for cluster in clusters:
+        cluster = np.sort(cluster)
+        order[cluster] = sorted(order[cluster], key=lambda j: energies[j])
+    return order
+
+def solve_segment(builder, params, k=6, method='auto', tol=1e-8, maxiter=200, guard=2,
+                  start=None):
+    """
+    依序求解一段參數(在同一個行程中)。第一個參數直接求解(或以start為初始值)，
+    之後以前一步的特徵向量作為LOBPCG的初始值，殘差大於tol(相對於||H||)時改用直接解法。
+    method為'lobpcg'、'direct'，或'auto'(三對角矩陣直接求解，其餘用LOBPCG)。
+    實際求k+guard個態：從上方進入的能階與第k個態交錯時，
+    LOBPCG的區塊裡已經有它，收斂與對應都不會出問題。
+    傳回k+guard個能量(len(params) x (k+guard)，已依重疊追蹤)、第一步與最後一步的特徵向量，
+    以及LOBPCG與直接解法的次數。
+    """
+    block = k + guard
+    energies = np.empty((len(params), block))
+    vectors = start
+    counts = {'lobpcg': 0, 'direct': 0}
+    first = None
+    for i, p in enumerate(params):
+        H = builder(p)
+        if method == 'auto':
+            method = 'direct' if bandwidth(H) <= 1 else 'lobpcg'
+        values = None
+        if method == 'lobpcg' and vectors is not None:
+            with warnings.catch_warnings():
+                # 是否收斂由下面的殘差判斷
+                warnings.simplefilter('ignore', UserWarning)
+                values, new = lobpcg(H, vectors.copy(), tol=tol, maxiter=maxiter, largest=False)
+            scale = np.max(np.asarray(abs(H).sum(axis=1)))
+            residual = np.linalg.norm(H @ new - new*values, axis=0)
+            if np.max(residual) > tol*scale*10:
+                values = None
+            else:
+                counts['lobpcg'] += 1
+        if values is None:
+            values, new = eigen_lowest(H, block)
+            counts['direct'] += 1
+        if vectors is not None:
+            order = match_levels(vectors, new, energies[i-1] if i else None, values)
+            values, new = values[order], new[:, order]
+            # 正負號與前一步一致，之後的重疊與初始值才連續
+            new = new*np.sign(np.sum(vectors*new, axis=0) + 1e-300)
+        energies[i] = values
+        vectors = new
+        if first is None:
+            first = new
+    return energies, first, vectors, counts
+
+def continuation(builder, params, k=6, method='auto', workers=1, segments=None,
+                 tol=1e-8, maxiter=200, guard=2):
+    """
+    求參數params中每一個值的最低k個能階，builder(p)傳回對稱的Hamiltonian。
+    參數分成segments段(預設等於workers)，workers > 1時以ProcessPoolExecutor同時計算，
+    每段的第一步直接求解，之後的方法與guard見solve_segment。
+    各段的能階再依交界處特徵向量的重疊接起來，整條曲線追蹤的是同一個態。
+    傳回能量(len(params) x k，第j行為第一個參數的第j低能階的演變)，
+    以及包含LOBPCG與直接解法次數的dict。
+    """
+    params = list(params)
+    segments = workers if segments is None else segments
+    pieces = [list(piece) for piece in np.array_split(np.arange(len(params)), segments) if len(piece)]
+    jobs = [[params[i] for i in piece] for piece in pieces]
+    run = partial(solve_segment, builder, k=k, method=method, tol=tol, maxiter=maxiter,
+                  guard=guard)
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(run, jobs))
+    else:
+        results = [run(job) for job in jobs]
+    energies = []
+    counts = {'lobpcg': 0, 'direct': 0}
+    previous = None
+    for segment, first, last, segment_counts in results:
+        if previous is not None:
+            order = match_levels(previous, first, energies[-1][-1], segment[0])
+            segment, last = segment[:, order], last[:, order]
+        energies.append(segment)
+        previous = last
+        for name in counts:
+            counts[name] += segment_counts[name]
+    return np.vstack(energies)[:, :k], counts
+
+if __name__ == '__main__':
+    # 與potential_well.coeff_matrix_out(1000, boundary=5, V0)相同的井，V0由0.01到0.5，共1000個點
+    V0s = np.linspace(0.01, 0.5, 1000)
+    builder = partial(square_well_hamiltonian, N=1000, boundary=5)
+    start = time.perf_counter()
+    energies, counts = continuation(builder, V0s, k=8, workers=2)
+    print("1000個V0共%.2f秒，%s" % (time.perf_counter()-start, counts))
+
+    # 二維長方形量子點：改變長寬比時能階交錯，依重疊追蹤而不是依大小排序
+    aspects = np.linspace(0.6, 1.6, 60)
+    start = time.perf_counter()
+    dot, dot_counts = continuation(partial(rectangular_dot_hamiltonian, n=40), aspects, k=6)
+    print("60個長寬比共%.2f秒，%s" % (time.perf_counter()-start, dot_counts))
+
+    fig, axs = plt.subplots(1, 2, figsize=(10, 4))
+    axs[0].plot(V0s, energies)
+    axs[0].set_xlabel(r'$V_0$')
+    axs[0].set_ylabel('eigenvalue')
+    axs[1].plot(aspects, dot)
+    axs[1].set_xlabel('aspect ratio')
+    plt.show()
@@ -0,0 +1,313 @@
+"""
+fd_operator.py
+~~~~~~~~~~~~~~
+等距網格上的有限差分運算子。
+heatconduction、potential、schrodinger、schrodinger_nd、heatconduction_nd等模組
+都需要同一個[-1, 2, -1](或高階差分)的矩陣，這裡統一建立：
+可選擇微分的階數(一次或二次)、精度(2、4、6階)、維度與邊界條件，
+並以稀疏矩陣(CSR)、帶狀格式(solve_banded/eig_banded)或不建立矩陣的LinearOperator表示。
+matrix-free的LinearOperator(operator_nd)只以陣列的切片計算差分，記憶體只需要幾個向量，
+可直接傳給cg、gmres、eigsh與lobpcg，三維網格也不必儲存矩陣。
+一維的差分矩陣依(N, h, 微分次數, 精度, 邊界條件)以lru_cache快取一份(cached_matrix)，
+-laplacian與帶狀格式每次呼叫時再由它以O(N)計算，不另外快取；
+多維的Kronecker和(cached_laplacian_nd)很大，只保留最近的兩個。
+傳回的矩陣與陣列都是唯讀的，需要修改時請先copy()。
+大網格算完後可呼叫clear_cache()釋放所有快取的矩陣
+(或分別呼叫cached_matrix.cache_clear()、cached_laplacian_nd.cache_clear())。
+邊界條件：
+'dirichlet'  邊界點(內部格點外側距離h處)的值為0，
+             高階差分超出邊界的點以奇鏡像u(-x) = -u(x)代回內部點；
+'neumann'    邊界的梯度為0，以邊界點與第一個內部點的中點為鏡面，
+             二階精度時與heatconduction_nd的T_b = T_1相同，對角線元素變為1；
+'periodic'   週期邊界。
+左右邊界不同時以(左, 右)表示。
+"""
+
+from functools import lru_cache
+import math
+import numpy as np
+from scipy.fft import dstn
+from scipy.sparse import coo_matrix, identity, kron
+from scipy.sparse.linalg import LinearOperator
+
+BOUNDARIES = ('dirichlet', 'neumann', 'periodic')
+
+@lru_cache(maxsize=None)
+def stencil(derivative=2, order=2):
+    """
+    中央差分的係數(位移-p到p，未除以h^derivative)，以tuple傳回。
+    例如stencil(2, 2) = (1, -2, 1)、stencil(1, 2) = (-1/2, 0, 1/2)。
+    """
+    p = (derivative+1)//2 + order//2 - 1
+    s = np.arange(-p, p+1)
+    # sum_s w_s s^n/n! = (n == derivative)，n = 0, ..., 2p
+    A = np.array([s**n/math.factorial(n) for n in range(2*p+1)], dtype=float)
+    b = np.zeros(2*p+1)
+    b[derivative] = 1.0
+    w = np.linalg.solve(A, b)
+    # 係數為對稱(偶數次微分)或反對稱(奇數次微分)，消去捨入誤差，矩陣才會完全對稱
+    w = (w + (-1)**derivative*w[::-1])/2
+    w[np.abs(w) < 1e-12] = 0.0
+    return tuple(w)
+
+def boundary_pair(bc):
+    """
+    將邊界條件整理成(左, 右)，並檢查名稱。
+    """
+    pair = (bc, bc) if isinstance(bc, str) else tuple(bc)
+    for b in pair:
+        if b not in BOUNDARIES:
+            raise ValueError("未知的邊界條件: %s" % (b,))
+    if ('periodic' in pair) and pair[0] != pair[1]:
+        raise ValueError("週期邊界需兩側相同")
+    return pair
+
+def mirror(j, N, bc):
+    """
+    將格點j(可為陣列，超出0到N-1的範圍)以邊界條件對應到內部點，傳回(內部點, 係數)。
+    dirichlet以邊界點(-1與N)為鏡面，j -> 2*(-1) - j並變號，落在邊界點本身時係數為0；
+    neumann以中點(-1/2與N-1/2)為鏡面；periodic取餘數。
+    """
+    left, right = bc
+    j = np.asarray(j)
+    sign = np.ones(j.shape)
+    if left == 'periodic':
+        return j % N, sign
+    for side, outside, odd, even in ((left, j < 0, -2, -1), (right, j >= N, 2*N, 2*N-1)):
+        if side == 'dirichlet':
+            sign = np.where(outside, -sign, sign)
+            j = np.where(outside, odd - j, j)
+        else:
+            j = np.where(outside, even - j, j)
+    sign = np.where((j < 0) | (j >= N), 0.0, sign)
+    return np.clip(j, 0, N-1), sign
+
+def read_only(A):
+    """
+    將稀疏矩陣(或陣列)設為唯讀，快取中的結果才不會被意外修改。
+    """
+    for array in (A.data, A.indices, A.indptr) if hasattr(A, 'indptr') else (A,):
+        array.flags.writeable = False
+    return A
+
+@lru_cache(maxsize=32)
+def cached_matrix(N, h, derivative, order, bc):
+    """
+    difference的CSR矩陣，所有格式共用的唯一快取。
+    """
+    w = stencil(derivative, order)
+    p = len(w)//2
+    rows = np.repeat(np.arange(N), 2*p+1)
+    cols = rows + np.tile(np.arange(-p, p+1), N)
+    cols, sign = mirror(cols, N, bc)
+    vals = np.tile(np.asarray(w), N)*sign/h**derivative
+    keep = vals != 0
+    rows, cols, vals = rows[keep], cols[keep], vals[keep]
+    A = coo_matrix((vals, (rows, cols)), shape=(N, N)).tocsr()
+    A.sum_duplicates()
+    A.eliminate_zeros()
+    return read_only(A)
+
+def difference(N, h=1.0, derivative=2, order=2, bc='dirichlet', form='sparse'):
+    """
+    N個內部格點(格距h)上的derivative次微分，精度為order階。
+    form為'sparse'(CSR)、'banded'(solve_banded的(l, u) = (p, p)格式，
+    上半部ab[:p+1]即為eig_banded的上帶狀格式)或'operator'(LinearOperator，
+    直接以陣列位移計算，不建立矩陣，見apply)。
+    """
+    bc = boundary_pair(bc)
+    if form == 'operator':
+        matvec = lambda u: apply(u, h, derivative, order, bc, axis=0)
+        return LinearOperator((N, N), matvec=matvec, matmat=matvec, dtype=float)
+    A = cached_matrix(int(N), float(h), int(derivative), int(order), bc)
+    if form == 'sparse':
+        return A
+    if form == 'banded':
+        return banded(A, bc)
+    raise ValueError("未知的格式: %s" % form)
+
+def banded(A, bc, sign=1):
+    """
+    sign*A的帶狀格式(唯讀，不快取)。
+    """
+    if bc[0] == 'periodic':
+        raise ValueError("週期邊界的矩陣不是帶狀矩陣")
+    return read_only(sign*to_banded(A))
+
+def to_banded(A, p=None):
+    """
+    將稀疏矩陣轉成solve_banded的格式ab[p + i - j, j] = A[i, j](上下帶寬皆為p)，
+    沒有使用的位置為0。
+    """
+    A = A.tocoo()
+    if p is None:
+        p = int(np.max(np.abs(A.row - A.col))) if A.nnz else 0
+    ab = np.zeros((2*p+1, A.shape[1]))
+    ab[p + A.row - A.col, A.col] = A.data
+    return ab
+
+def laplacian(N, h=1.0, order=2, bc='dirichlet', form='sparse'):
+    """
+    一維的-d^2/dx^2(注意正負號：二階精度時為[-1, 2, -1]/h^2，正定)，
+    與各模組原本建立的係數矩陣相同，參數見difference。
+    """
+    bc = boundary_pair(bc)
+    if form == 'operator':
+        return -difference(N, h, 2, order, bc, form)
+    A = cached_matrix(int(N), float(h), 2, int(order), bc)
+    if form == 'banded':
+        return banded(A, bc, -1)
+    if form != 'sparse':
+        raise ValueError("未知的格式: %s" % form)
+    return read_only(-A)
+
+def clear_cache():
+    """
+    釋放所有快取的矩陣(一維的差分矩陣與多維的Kronecker和)。
+    """
+    cached_matrix.cache_clear()
+    cached_laplacian_nd.cache_clear()
+
+def apply(u, h=1.0, derivative=2, order=2, bc='dirichlet', axis=0):
+    """
+    不建立矩陣，直接計算u沿著axis方向的derivative次微分(與difference的矩陣相乘相同)。
+    每一個位移s以切片result[i] += w_s*u[i+s]計算，
+    只有靠近邊界的p列需要以mirror找出超出邊界的點，除了結果之外不複製u。
+    """
+    w = stencil(derivative, order)
+    p = len(w)//2
+    bc = boundary_pair(bc)
+    u = np.moveaxis(np.asarray(u), axis, 0)
+    N = u.shape[0]
+    result = w[p]*u
+    if result.dtype.kind == 'i':
+        result = result.astype(float)
+    for shift in range(-p, p+1):
+        c = w[p+shift]
+        if shift == 0 or c == 0:
+            continue
+        if abs(shift) < N:
+            if shift > 0:
+                result[:N-shift] += c*u[shift:]
+            else:
+                result[-shift:] += c*u[:N+shift]
+        rows = np.arange(max(N-shift, 0), N) if shift > 0 else np.arange(0, min(-shift, N))
+        index, sign = mirror(rows + shift, N, bc)
+        result[rows] += (c*sign).reshape((-1,) + (1,)*(u.ndim-1))*u[index]
+    if h != 1:
+        result /= h**derivative
+    return np.moveaxis(result, 0, axis)
+
+def laplacian_nd(shape, h=1.0, order=2, bc='dirichlet', form='sparse'):
+    """
+    多維的-laplacian，shape為每一個方向的格點數，h與bc可為每一個方向各自的值
+    (bc的每一個元素可為(左, 右))。
+    'sparse'為一維矩陣的Kronecker和 sum_a I⊗...⊗L_a⊗...⊗I(CSR，已快取)；
+    'operator'為LinearOperator，沿每一個方向以apply計算，不建立任何矩陣，
+    matmat時最後一維為不同的向量(例如LOBPCG的區塊)。
+    """
+    shape, h, bc = grid_arguments(shape, h, bc)
+    if form == 'sparse':
+        return cached_laplacian_nd(shape, h, int(order), bc)
+    if form != 'operator':
+        raise ValueError("未知的格式: %s" % form)
+    return operator_nd(shape, h, order, bc)
+
+def grid_arguments(shape, h, bc):
+    """
+    將shape、h與bc整理成每一個方向各一個值的tuple。
+    """
+    shape = tuple(int(n) for n in shape)
+    h = tuple(float(v) for v in np.broadcast_to(h, (len(shape),)))
+    bc = tuple(boundary_pair(b) for b in ([bc]*len(shape) if isinstance(bc, str) else bc))
+    return shape, h, bc
+
+def operator_nd(shape, h=1.0, order=2, bc='dirichlet', scale=1.0, potential=None):
+    """
+    matrix-free的scale*(-laplacian) + potential，傳回LinearOperator。
+    potential為純量或形狀為shape的陣列(熱傳導的k、薛丁格方程式的V)。
+    matvec只用apply的陣列切片計算，matmat時最後一維為不同的向量(例如LOBPCG的區塊)；
+    除了輸入與結果之外只多一個暫存的向量，不儲存任何矩陣元素。
+    """
+    shape, h, bc = grid_arguments(shape, h, bc)
+    size = int(np.prod(shape))
+    if potential is not None:
+        potential = np.asarray(potential, dtype=float)
+        if potential.ndim:
+            potential = potential.reshape(shape + (1,))
+    def matvec(v):
+        u = v.reshape(shape + (-1,))
+        result = apply(u, h[0], 2, order, bc[0], axis=0)
+        for a in range(1, len(shape)):
+            result += apply(u, h[a], 2, order, bc[a], axis=a)
+        result *= -scale
+        if potential is not None:
+            result += potential*u
+        return result.reshape(v.shape)
+    return LinearOperator((size, size), matvec=matvec, matmat=matvec, dtype=float)
+
+def diagonal_nd(shape, h=1.0, order=2, bc='dirichlet'):
+    """
+    多維-laplacian的對角線(形狀為shape)，不建立多維矩陣，供Jacobi預條件子使用。
+    """
+    shape, h, bc = grid_arguments(shape, h, bc)
+    d = np.zeros(shape)
+    for a, n in enumerate(shape):
+        line = cached_matrix(n, h[a], 2, int(order), bc[a]).diagonal()
+        d -= line.reshape((-1,) + (1,)*(len(shape)-a-1))
+    return d
+
+def spectral_preconditioner(shape, h=1.0, shift=0.0, scale=1.0):
+    """
+    (scale*(-laplacian) + shift)^-1，-laplacian為二階精度、各邊界皆為dirichlet。
+    DST-I的基底即為[-1, 2, -1]的特徵向量，特徵值為(2-2cos(j*pi/(n+1)))/h^2，
+    因此正轉換後除以特徵值再轉換回來即可，不需要任何分解，計算量為O(N log N)。
+    shift為常數時就是精確的反矩陣；shift隨位置變化時以平均值代入，作為CG或LOBPCG的預條件子。
+    """
+    shape, h, _ = grid_arguments(shape, h, 'dirichlet')
+    spectrum = shift
+    for a, n in enumerate(shape):
+        lam = scale*(2 - 2*np.cos(np.arange(1, n+1)*np.pi/(n+1)))/h[a]**2
+        spectrum = spectrum + lam.reshape((-1,) + (1,)*(len(shape)-a-1))
+    axes = tuple(range(len(shape)))
+    def solve(r):
+        y = r.reshape(shape + (-1,))
+        y = dstn(dstn(y, type=1, axes=axes, norm='ortho')/spectrum[..., np.newaxis],
+                 type=1, axes=axes, norm='ortho')
+        return y.reshape(r.shape)
+    size = int(np.prod(shape))
+    return LinearOperator((size, size), matvec=solve, matmat=solve, dtype=float)
+
+@lru_cache(maxsize=2)
+def cached_laplacian_nd(shape, h, order, bc):
+    """
+    laplacian_nd的CSR矩陣。128^3的網格就有數百MB，只保留最近的兩個。
+    """
+    A = 0
+    for a, n in enumerate(shape):
+        left = identity(int(np.prod(shape[:a])))
+        right = identity(int(np.prod(shape[a+1:])))
+        L = -cached_matrix(n, h[a], 2, order, bc[a])
+        A = A + kron(kron(left, L), right, format='csr')
+    return read_only(A.tocsr())
+
+if __name__ == '__main__':
+    import time
+    from scipy.linalg import eig_banded
+    # 盒中粒子：-psi'' = E psi，精確的能量為(n pi)^2
+    for order in (2, 4, 6):
+        N = 200
+        h = 1/(N+1)
+        ab = laplacian(N, h, order, form='banded')
+        p = len(ab)//2
+        E = eig_banded(ab[:p+1], eigvals_only=True, select='i', select_range=(0, 2))
+        print("%d階精度，最低三個能量的相對誤差" % order, E/(np.arange(1, 4)*np.pi)**2 - 1)
+    start = time.perf_counter()
+    laplacian_nd((100, 100, 100), 0.01)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    laplacian_nd((100, 100, 100), 0.01)
+    print("三維-laplacian(10^6個格點)：第一次%.3f秒，快取%.2g秒" % (first, time.perf_counter()-start))
+    u = np.random.default_rng(0).standard_normal(10**6)
+    A, op = laplacian_nd((100, 100, 100), 0.01), laplacian_nd((100, 100, 100), 0.01, form='operator')
+    print("矩陣與matrix-free的差異", np.max(np.abs(A @ u - op @ u))/np.max(np.abs(A @ u)))
@@ -9,10 +9,15 @@ heatconduction.py
 Chang Kai-Po @ Jian Lab 2023/03/15
 """
 
+from functools import lru_cache
 import numpy as np
-from scipy.sparse import csr_matrix 
-from scipy.sparse.linalg import spsolve
+from scipy.sparse import identity
+from scipy.sparse.linalg import spsolve, splu, cg
+from scipy.linalg import solve_banded, cholesky_banded, cho_solve_banded, LinAlgError
 import matplotlib.pyplot as plt
+from instrument import instrument, phase
+from plotting import plot, show
+from fd_operator import laplacian, operator_nd, spectral_preconditioner
 
 def coefficient_matrix (N, k, h, Ta):
     """
@@ -25,44 +30,162 @@ def coefficient_matrix (N, k, h, Ta):
     [0, -1, 2+kh^2, -1, ..., 0]
     [...  ...  ...  ...  ...]
     [0, 0, ..., ..., -1, 2+kh^2]
+    [-1, 2, -1]的部分為fd_operator.laplacian快取的稀疏矩陣，不經過N×N的稠密矩陣，
+    記憶體與時間皆為O(N)。
     """
-    A = np.zeros((N,N))
-    A[0,0], A[0,1] = 2+k*h**2, -1
-    A[N-1,N-1], A[N-1,N-2] = 2+k*h**2, -1
-    for i in range(1,N-1):
-        A[i,i-1] = -1
-        A[i,i] = 2+k*h**2
-        A[i,i+1] = -1
-    return csr_matrix(A)
+    return laplacian(N) + k*h**2*identity(N, format='csr')
 
-def heatconduction_numerical(L, T0, T1, Ta, k, N):
+def coefficient_banded (N, k, h):
+    """
+    以solve_banded所需的帶狀格式建立同一個係數矩陣，只儲存3N個元素：
+    ab[0]為上對角線(ab[0,0]不使用)，ab[1]為主對角線，
+    ab[2]為下對角線(ab[2,N-1]不使用)。
+    """
+    ab = laplacian(N, form='banded').copy()
+    ab[1] += k*h**2
+    return ab
+
+def thomas (a, b, c, d):
+    """
+    Thomas演算法，即三對角矩陣的高斯消去法，計算量為O(N)。
+    a為下對角線，b為主對角線，c為上對角線，長度皆為N(a[0]與c[N-1]不使用)，
+    d為右邊向量。
+    """
+    N = len(d)
+    cp, dp = np.empty(N), np.empty(N)
+    cp[0], dp[0] = c[0]/b[0], d[0]/b[0]
+    for i in range(1,N): # 前向消去
+        m = b[i] - a[i]*cp[i-1]
+        cp[i] = c[i]/m
+        dp[i] = (d[i] - a[i]*dp[i-1])/m
+    x = np.empty(N)
+    x[N-1] = dp[N-1]
+    for i in range(N-2,-1,-1): # 回代
+        x[i] = dp[i] - cp[i]*x[i+1]
+    return x
+
+@lru_cache(maxsize=32)
+def coefficient_factor (N, k, h):
+    """
+    分解係數矩陣後快取起來。
+    係數矩陣只與(N, k, h)有關，T0、T1、Ta只影響右邊向量，
+    因此同一組(N, k, h)只需要分解一次，之後每次求解只剩O(N)的回代。
+    k>0時係數矩陣為對稱正定，以cholesky_banded分解(結果為唯讀陣列)；
+    k<=0時可能不是正定，cholesky_banded失敗時改用稀疏LU分解(splu)。
+    傳回(分解方式, 分解結果)，分解方式為'cholesky'或'lu'。
+    """
+    try:
+        c = cholesky_banded(coefficient_banded(N, k, h)[:2]) # 只需上對角線與主對角線
+    except LinAlgError:
+        return 'lu', splu(coefficient_matrix(N, k, h, 0).tocsc())
+    c.flags.writeable = False
+    return 'cholesky', c
+
+def heatconduction_sweep(L, T0, T1, Ta, k, N):
+    """
+    一次求解多組邊界條件的熱傳導問題。
+    T0、T1、Ta可以是純量或長度為M的陣列(彼此會broadcast)，
+    L、k、N則是所有解共用的參數。
+    係數矩陣只分解一次(見coefficient_factor)，
+    M個右邊向量組成N×M的矩陣後一次回代。
+    傳回形狀為(M, N+2)的陣列，每一列為一組邊界條件的溫度分布。
+    """
+    dx = L/(N+1) # 加熱桿的每一分割的長度
+    T0, T1, Ta = np.broadcast_arrays(*np.atleast_1d(T0, T1, Ta))
+    # 建立N×M的右邊矩陣，每一行為一組邊界條件
+    B = np.repeat(k*dx**2*Ta[np.newaxis,:].astype(float), N, axis=0)
+    B[0] += T0
+    B[N-1] += T1
+    T = np.empty((len(Ta), N+2))
+    with phase('assembly'):
+        kind, factor = coefficient_factor(N, k, dx)
+    with phase('solve'):
+        if kind == 'cholesky':
+            T[:,1:-1] = cho_solve_banded((factor, False), B).T
+        else:
+            T[:,1:-1] = factor.solve(B).T
+    T[:,0] = T0
+    T[:,-1] = T1
+    return T
+
+@instrument
+def heatconduction_numerical(L, T0, T1, Ta, k, N, method='cholesky'):
     """
     熱傳導問題的數值解，其中L為加熱桿的長度，T0為加熱桿左端的溫度，
     T1為加熱桿右端的溫度，Ta為加熱桿本身的溫度，k為傳導係數，
     N為加熱桿的分割數。
+    method為求解方式：'cholesky'重複使用快取的分解結果(見heatconduction_sweep，
+    係數矩陣不是正定時改用LU分解)，
+    'banded'使用solve_banded(LAPACK，O(N))，
+    'thomas'使用純Python的Thomas演算法(O(N))，'sparse'使用spsolve，
+    'cg'為matrix-free：係數矩陣為只以陣列切片計算的LinearOperator(fd_operator.operator_nd)，
+    以DST-I的精確反矩陣為預條件子，共軛梯度法一次迭代就收斂，不儲存任何矩陣元素。
     """
+    if method == 'cholesky':
+        return heatconduction_sweep(L, T0, T1, Ta, k, N)[0]
     # 參數設定
     dx = L/(N+1) # 加熱桿的每一分割的長度    
-    # 建立線性方程式的係數矩陣
-    A = coefficient_matrix(N, k, dx, Ta)
-    # 建立線性方程式的右邊向量
+    # 建立線性方程式的右邊向量，兩端的溫度要加到第一個與最後一個方程式
     b = np.repeat(k*dx**2*Ta, N)
-    b[0] = T0
-    b[N-1] = T1
+    b[0] += T0
+    b[N-1] += T1
     T = np.zeros(N+2)
-    T[1:-1] = spsolve(A,b)
+    if method == 'banded':
+        with phase('assembly'):
+            ab = coefficient_banded(N, k, dx)
+        with phase('solve'):
+            T[1:-1] = solve_banded((1,1), ab, b)
+    elif method == 'thomas':
+        with phase('assembly'):
+            off = np.full(N, -1.0) # 上、下對角線
+            diagonal = np.full(N, 2+k*dx**2)
+        with phase('solve'):
+            T[1:-1] = thomas(off, diagonal, off, b)
+    elif method == 'sparse':
+        with phase('assembly'):
+            A = coefficient_matrix(N, k, dx, Ta)
+        with phase('solve'):
+            T[1:-1] = spsolve(A, b)
+    elif method == 'cg':
+        with phase('assembly'):
+            A = operator_nd((N,), potential=k*dx**2)
+            M = spectral_preconditioner((N,), shift=k*dx**2)
+        with phase('solve'):
+            T[1:-1], status = cg(A, b, rtol=1e-12, M=M)
+        if status != 0:
+            raise RuntimeError("共軛梯度法沒有收斂")
+    else:
+        raise ValueError("未知的求解方式: %s" % method)
     T[0] = T0
     T[-1] = T1    
     return T    
 
-def heatconduction_analytical(L, T0, T1, Ta, k, N):
+def heatconduction_analytical(L, T0, T1, Ta, k, N, x=None):
     """
     熱傳導問題的數值解，其中L為加熱桿的長度，T0為加熱桿左端的溫度，
     T1為加熱桿右端的溫度，Ta為加熱桿本身的溫度，k為傳導係數，
     N為加熱桿的分割數。
+    解析解為T = Ta + (T0-Ta)*S(L-x)/S(L) + (T1-Ta)*S(x)/S(L)，其中
+    k>0時S(x) = sinh(sqrt(k)x)(即a*exp(sqrt(k)x) + b*exp(-sqrt(k)x)的形式，
+    在T0=40、T1=200、Ta=20、k=0.01、L=10時a=73.4523、b=-53.4523)；
+    k=0時S(x) = x，解為直線T = T0 + (T1-T0)x/L；
+    k<0時S(x) = sin(sqrt(-k)x)，sin(sqrt(-k)L) = 0時沒有唯一解，會產生ValueError。
+    k(與T0、T1、Ta)可為陣列，例如nonlinear_fit的形狀(B, 1)，依broadcasting計算。
+    若給定x，則在x(可為不等距的格點)上計算解析解，此時N不使用。
     """
-    x = np.linspace(0,L,N+2)
-    y = 73.4523*np.exp(0.1*x) - 53.4523*np.exp(-0.1*x) + Ta #解析解            
+    if x is None:
+        x = np.linspace(0,L,N+2)
+    x = np.asarray(x, dtype=float)
+    k = np.asarray(k, dtype=float)
+    # 三種情形分別以np.where選取，不適用的元素以1代入，避免sqrt負數或除以0
+    m = np.sqrt(np.where(k > 0, k, 1.0))
+    w = np.sqrt(np.where(k < 0, -k, 1.0))
+    def S(s):
+        return np.where(k > 0, np.sinh(m*s)/m, np.where(k < 0, np.sin(w*s)/w, s))
+    SL = S(L)
+    if np.any(np.abs(SL) < 1e-12):
+        raise ValueError("sin(sqrt(-k)L) = 0，邊界值問題沒有唯一解")
+    y = Ta + ((T0-Ta)*S(L-x) + (T1-Ta)*S(x))/SL #解析解
     return y
 
 if __name__ == '__main__':
@@ -93,16 +216,16 @@ if __name__ == '__main__':
     # 繪圖      
     fig, (ax1, ax2) = plt.subplots(nrows=1, ncols=2, figsize=(8, 4))
     # N=4時的數值解與解析解
-    ax1.plot(x1, numerical, color='tab:blue', marker='o', markersize=2, label='Numerical')
-    ax1.plot(x1, analytical, color='tab:red', marker='o', markersize=2, label='Analytical')
+    plot(x1, numerical, ax=ax1, color='tab:blue', marker='o', markersize=2, label='Numerical')
+    plot(x1, analytical, ax=ax1, color='tab:red', marker='o', markersize=2, label='Analytical')
     ax1.set_title('N=4')
 
     # N=100時的數值解與解析解
-    ax2.plot(x2, numerical_2, color='tab:blue', marker='o', markersize=2, label='Numerical')
-    ax2.plot(x2, analytical_2, color='tab:red', marker='o', markersize=2, label='Analytical')
+    plot(x2, numerical_2, ax=ax2, color='tab:blue', marker='o', markersize=2, label='Numerical')
+    plot(x2, analytical_2, ax=ax2, color='tab:red', marker='o', markersize=2, label='Analytical')
     ax2.set_title('N=100')
     
     # 設定圖例
     plt.xlabel('x')
     plt.ylabel('T')
-    plt.show()    
+    show()    
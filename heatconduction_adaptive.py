@@ -0,0 +1,117 @@
+"""
+heatconduction_adaptive.py
+~~~~~~~~~~~~~~~~~~~~~~~~~~
+以不等距網格求解加熱桿的熱傳導問題，並依誤差指標自動加密網格。
+微分方程與heatconduction.py相同：d^2T/dx^2 + k*(Ta-T) = 0
+解變化劇烈的地方(例如k很大時兩端的邊界層)需要較密的格點，
+等距網格會在平緩的地方浪費格點，因此依誤差指標重新分配格點。
+"""
+
+import numpy as np
+from scipy.linalg import solve_banded
+import matplotlib.pyplot as plt
+from heatconduction import heatconduction_analytical, heatconduction_numerical
+
+def coefficient_banded_nonuniform (x, k):
+    """
+    建立不等距網格的係數矩陣(solve_banded的帶狀格式)，x為包含兩端的所有格點。
+    一般的不等距三點差分在格距變化處有 (h1-h0)/3 * d^3T/dx^3 的一階截斷誤差，
+    網格一不等距誤差反而變大，因此改以線性元素(Galerkin)推導三點格式：
+    第i列為 [-1/h0 + k*h0/6, 1/h0 + 1/h1 + k*(h0+h1)/3, -1/h1 + k*h1/6]，
+    其中h0 = x[i]-x[i-1]，h1 = x[i+1]-x[i]，矩陣為對稱三對角。
+    傳回帶狀係數矩陣，以及兩端溫度要乘上的係數(左端, 右端)。
+    """
+    h = np.diff(x)
+    h0, h1 = h[:-1], h[1:]
+    off = -1/h + k*h/6 # 第i與第i+1個格點之間的係數
+    ab = np.empty((3, len(h0)))
+    ab[0,1:] = off[1:-1]
+    ab[1] = 1/h0 + 1/h1 + k*(h0+h1)/3
+    ab[2,:-1] = off[1:-1]
+    ab[0,0], ab[2,-1] = 0, 0
+    return ab, (off[0], off[-1])
+
+def heatconduction_nonuniform(x, T0, T1, Ta, k):
+    """
+    在不等距網格x(包含兩端，需遞增)上求熱傳導問題的數值解，
+    T0、T1、Ta、k與heatconduction_numerical相同。
+    傳回每一個格點上的溫度。
+    """
+    ab, (c0, c1) = coefficient_banded_nonuniform(x, k)
+    h = np.diff(x)
+    b = k*Ta*(h[:-1]+h[1:])/2
+    b[0] -= c0*T0
+    b[-1] -= c1*T1
+    T = np.empty(len(x))
+    T[1:-1] = solve_banded((1,1), ab, b)
+    T[0], T[-1] = T0, T1
+    return T
+
+def error_indicator (x, T):
+    """
+    每一個格點的誤差指標|T''|，以不等距網格的二階差分估計，
+    兩端使用相鄰內部點的值。以直線內插時，區間的誤差約為h^2*|T''|/8。
+    """
+    h = np.diff(x)
+    d = np.diff(T)/h
+    d2 = np.abs(2*np.diff(d)/(h[:-1]+h[1:]))
+    return np.concatenate(([d2[0]], d2, [d2[-1]]))
+
+def equidistribute (x, monitor, N):
+    """
+    依照monitor產生N個內部點的新網格，使每一個區間內monitor的積分相等，
+    monitor大的地方格點較密，且格距是平滑變化的。
+    """
+    c = np.concatenate(([0], np.cumsum((monitor[:-1]+monitor[1:])/2*np.diff(x))))
+    return np.interp(np.linspace(0, c[-1], N+2), c, x)
+
+def heatconduction_adaptive(L, T0, T1, Ta, k, target, N=10, growth=1.5, max_level=30):
+    """
+    以自動加密網格求解熱傳導問題，L、T0、T1、Ta、k與heatconduction_numerical相同。
+    從N個內部點的等距網格開始，每一層將內部點數乘上growth，
+    並依誤差指標|T''|^(1/3)重新分配格點(見equidistribute)，
+    直到與heatconduction_analytical的最大誤差小於target，或達到max_level層。
+    傳回最後的格點、溫度，以及每一層的(層數, 內部點數, 最大誤差)。
+    """
+    x = np.linspace(0, L, N+2)
+    history = []
+    for level in range(max_level+1):
+        T = heatconduction_nonuniform(x, T0, T1, Ta, k)
+        error = np.max(np.abs(T - heatconduction_analytical(L, T0, T1, Ta, k, N, x=x)))
+        history.append((level, N, error))
+        if error < target:
+            break
+        monitor = error_indicator(x, T)**(1/3)
+        N = int(np.ceil(growth*N))
+        x = equidistribute(x, monitor + 1e-3*np.max(monitor), N)
+    return x, T, history
+
+if __name__ == '__main__':
+    T0 = 40.0 # 左端的溫度
+    T1 = 200.0 # 右端的溫度
+    Ta = 20.0 # 加熱桿本身的溫度
+    L = 10.0 # 加熱桿的長度
+    target = 1e-3 # 目標誤差
+
+    # k=0.01時解只是緩慢變化；k=25時在兩端只有約0.2寬的邊界層
+    fig, axs = plt.subplots(nrows=1, ncols=2, figsize=(8, 4))
+    for ax, k in zip(axs, (0.01, 25.0)):
+        x, T, history = heatconduction_adaptive(L, T0, T1, Ta, k, target)
+        for level, n, error in history:
+            print("k=%g，第%d層：內部點數%d，與解析解的最大誤差為%g" % (k, level, n, error))
+        # 等距網格需要的點數
+        N = 10
+        while np.max(np.abs(heatconduction_numerical(L, T0, T1, Ta, k, N)
+                            - heatconduction_analytical(L, T0, T1, Ta, k, N))) > target:
+            N = int(np.ceil(1.5*N))
+        print("k=%g，等距網格需要約%d個內部點才能讓誤差小於%g" % (k, N, target))
+
+        # 繪圖
+        ax.plot(x, T, color='tab:blue', marker='o', markersize=2, label='Adaptive')
+        ax.plot(x, heatconduction_analytical(L, T0, T1, Ta, k, 0, x=x), color='tab:red',
+                label='Analytical')
+        ax.set_title('k=%g' % k)
+    plt.xlabel('x')
+    plt.ylabel('T')
+    plt.legend()
+    plt.show()
@@ -0,0 +1,192 @@
+"""
+heatconduction_nd.py
+~~~~~~~~~~~~~~~~~~~~
+二維平板與三維塊材的穩態熱傳導問題，使用有限差分法求解。
+微分方程為：laplacian(T) + k*(Ta-T) = 0
+每一個方向的網格與heatconduction.py相同：h = L/(N+1)，只有內部的點是未知數。
+係數矩陣以一維矩陣的Kronecker積組合而成(稀疏矩陣)，
+並以預條件共軛梯度法(PCG)求解，避免spsolve在三維時的fill-in。
+matrix_free時係數矩陣改為只以陣列切片計算的LinearOperator(fd_operator.operator_nd)，
+不儲存任何矩陣元素，三維的大網格也只需要幾個向量的記憶體。
+"""
+
+import numpy as np
+from scipy.sparse import diags, identity, csr_matrix
+from scipy.sparse.linalg import cg, spilu, LinearOperator
+import matplotlib.pyplot as plt
+from fd_operator import laplacian_nd, operator_nd, diagonal_nd, spectral_preconditioner
+
+def boundary_kind (b):
+    """
+    判斷一個邊界條件的種類，傳回('dirichlet', 溫度)或('neumann', 向外的溫度梯度)。
+    數字(或陣列)代表固定溫度；None代表絕熱(梯度為0)；
+    ('neumann', g)代表向外法向量方向的溫度梯度為g。
+    """
+    if b is None:
+        return 'neumann', 0.0
+    if isinstance(b, tuple) and len(b) == 2 and b[0] == 'neumann':
+        return b
+    return 'dirichlet', b
+
+def coefficient_matrix_nd (N, k, h, bc):
+    """
+    建立多維熱傳導問題的係數矩陣與邊界條件對右邊向量的貢獻。
+    N、h為每一個方向的格點數與格距，bc為每一個方向的(左邊界, 右邊界)。
+    係數矩陣為 sum_a I⊗...⊗D_a/h_a^2⊗...⊗I + k*I，
+    其中D_a為一維的[-1, 2, -1]矩陣(未除以h^2)，Neumann邊界以鏡像點T_b = T_1 + g*h
+    消去邊界點，對應的對角線元素變為1(g的貢獻在右邊向量)。
+    Kronecker和由fd_operator.laplacian_nd建立(已快取)，只儲存非零元素。
+    傳回CSR格式的係數矩陣，以及形狀為N的邊界項陣列。
+    """
+    A = laplacian_nd(N, h, bc=boundary_kinds(bc)) + k*identity(int(np.prod(N)), format='csr')
+    return csr_matrix(A), boundary_term(N, h, bc)
+
+def coefficient_operator_nd (N, k, h, bc):
+    """
+    與coefficient_matrix_nd相同，但係數矩陣為matrix-free的LinearOperator。
+    """
+    return operator_nd(N, h, bc=boundary_kinds(bc), potential=k), boundary_term(N, h, bc)
+
+def boundary_kinds (bc):
+    """
+    每一個方向的(左邊界, 右邊界)的種類，即fd_operator的邊界條件名稱。
+    """
+    return [tuple(boundary_kind(b)[0] for b in pair) for pair in bc]
+
+def boundary_term (N, h, bc):
+    """
+    邊界條件對右邊向量的貢獻(形狀為N)。
+    """
+    b = np.zeros(N)
+    for a in range(len(N)):
+        # 邊界條件對最靠近邊界的那一層格點的貢獻
+        for end, index in ((0, 0), (1, N[a]-1)):
+            kind, value = boundary_kind(bc[a][end])
+            face = (slice(None),)*a + (index,)
+            if kind == 'dirichlet':
+                b[face] += np.asarray(value, dtype=float)/h[a]**2
+            else:
+                b[face] += np.asarray(value, dtype=float)/h[a]
+    return b
+
+def preconditioner (A, kind):
+    """
+    建立PCG使用的預條件子：
+    'jacobi'為對角線的倒數，'ilu'為不完全LU分解(spilu)，
+    ILU使用原本的排列順序且不做樞軸交換，分解結果才會接近對稱，CG才會收斂；
+    'multigrid'為代數多重網格(需要安裝pyamg)，None代表不使用。
+    """
+    if kind is None:
+        return None
+    if kind == 'jacobi':
+        return diags(1/A.diagonal())
+    if kind == 'ilu':
+        ilu = spilu(A.tocsc(), drop_tol=1e-2, fill_factor=10, permc_spec='NATURAL',
+                    diag_pivot_thresh=0, options={'SymmetricMode': True})
+        return LinearOperator(A.shape, ilu.solve)
+    if kind == 'multigrid':
+        try:
+            import pyamg
+        except ImportError:
+            raise ImportError("multigrid預條件子需要安裝pyamg")
+        return pyamg.smoothed_aggregation_solver(A).aspreconditioner(cycle='V')
+    raise ValueError("未知的預條件子: %s" % kind)
+
+def operator_preconditioner (kind, N, k, h, bc):
+    """
+    不需要係數矩陣的預條件子：'jacobi'的對角線由fd_operator.diagonal_nd計算；
+    'spectral'為以DST-I求出的精確反矩陣(各邊界皆為固定溫度時)，PCG一次迭代就收斂。
+    ILU與多重網格需要矩陣元素，不能用於matrix_free。
+    """
+    if kind is None:
+        return None
+    if kind == 'jacobi':
+        return diags(1/(diagonal_nd(N, h, bc=boundary_kinds(bc)) + k).ravel())
+    if kind == 'spectral':
+        if any(side != 'dirichlet' for pair in boundary_kinds(bc) for side in pair):
+            raise ValueError("spectral預條件子只適用於各邊界皆為固定溫度")
+        return spectral_preconditioner(N, h, k)
+    raise ValueError("預條件子%s需要矩陣，不能用於matrix_free" % kind)
+
+def default_preconditioner (bc, matrix_free):
+    """
+    precond='auto'時的預條件子：各邊界皆為固定溫度時為'spectral'(PCG一次迭代就收斂)；
+    否則有係數矩陣時為'ilu'，matrix_free時為None。
+    這些網格的對角線幾乎是常數，'jacobi'與不使用預條件子差不多，
+    範例中甚至需要更多次迭代(306次，不使用時144次，ilu 56次)，因此不作為預設。
+    """
+    if all(side == 'dirichlet' for pair in boundary_kinds(bc) for side in pair):
+        return 'spectral'
+    return None if matrix_free else 'ilu'
+
+def heatconduction_nd(L, bc, Ta, k, N, precond='auto', tol=1e-8, maxiter=None,
+                      matrix_free=False, history=False):
+    """
+    多維熱傳導問題的數值解，L為每一個方向的長度，bc為每一個方向的
+    (左邊界, 右邊界)(見boundary_kind)，Ta為環境溫度，k為傳導係數，
+    N為每一個方向的格點數。例如二維平板為L=(1.0, 2.0)、N=(50, 100)。
+    以預條件共軛梯度法求解，precond見preconditioner與operator_preconditioner，
+    預設的'auto'見default_preconditioner。
+    tol為相對殘差。matrix_free為True時不建立係數矩陣(見coefficient_operator_nd)。
+    傳回形狀為N的內部溫度分布，以及包含迭代次數(iterations)、
+    最後的相對殘差(residual)與是否收斂(converged)的dict。
+    history為True時另外記錄每次迭代的相對殘差(residuals)，
+    每次迭代多一次矩陣乘法，只在需要觀察收斂情形時使用。
+    右邊向量為0時殘差不除以它的大小。
+    """
+    N = tuple(N)
+    h = [L[a]/(N[a]+1) for a in range(len(N))] # 每一個方向的格距
+    if precond == 'auto':
+        precond = default_preconditioner(bc, matrix_free)
+    if matrix_free:
+        A, b = coefficient_operator_nd(N, k, h, bc)
+        M = operator_preconditioner(precond, N, k, h, bc)
+    else:
+        A, b = coefficient_matrix_nd(N, k, h, bc)
+        if precond == 'spectral':
+            M = operator_preconditioner(precond, N, k, h, bc)
+        else:
+            M = preconditioner(A, precond)
+    b = (b + k*np.asarray(Ta, dtype=float)).ravel()
+    norm_b = np.linalg.norm(b) or 1.0
+    iterations, residuals = [0], []
+    def record(xk):
+        iterations[0] += 1
+        if history:
+            residuals.append(np.linalg.norm(b - A @ xk)/norm_b)
+    T, status = cg(A, b, rtol=tol, maxiter=maxiter, M=M, callback=record)
+    info = {'iterations': iterations[0], 'residual': float(np.linalg.norm(b - A @ T)/norm_b),
+            'converged': status == 0}
+    if history:
+        info['residuals'] = residuals
+    return T.reshape(N), info
+
+if __name__ == '__main__':
+    Ta = 20.0 # 環境溫度
+    k = 0.01 # 熱傳導係數
+    L = (10.0, 10.0) # 平板的長與寬
+    N = (100, 100) # 每一個方向的格點數
+
+    # 左邊40度、右邊200度、上下絕熱，結果應與一維加熱桿相同
+    bc = ((40.0, 200.0), (None, None))
+    for precond in (None, 'jacobi', 'ilu', 'auto'):
+        T, info = heatconduction_nd(L, bc, Ta, k, N, precond=precond)
+        print("預條件子%s：迭代%d次，最後的相對殘差為%g" % (precond, info['iterations'],
+                                                     info['residual']))
+
+    # 三維塊材，各面皆為固定溫度：matrix-free加上DST預條件子，不建立任何矩陣
+    bc3 = ((200.0, 20.0), (20.0, 20.0), (20.0, 20.0))
+    for matrix_free in (False, True):
+        T3, info = heatconduction_nd((1.0, 1.0, 1.0), bc3, Ta, 1.0, (100, 100, 100),
+                                     precond='spectral', matrix_free=matrix_free)
+        print("三維%s：迭代%d次，中心溫度%.4f" % ('matrix-free' if matrix_free else '稀疏矩陣',
+                                          info['iterations'], T3[50, 50, 50]))
+
+    # 左邊加熱、其餘三邊為20度
+    bc = ((200.0, 20.0), (20.0, 20.0))
+    T, info = heatconduction_nd(L, bc, Ta, k, N)
+    plt.imshow(T.T, origin='lower', extent=(0, L[0], 0, L[1]))
+    plt.colorbar(label='T')
+    plt.xlabel('x')
+    plt.ylabel('y')
+    plt.show()
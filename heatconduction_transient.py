@@ -0,0 +1,130 @@
+"""
+heatconduction_transient.py
+~~~~~~~~~~~~~~~~~~~~~~~~~~~
+加熱桿的暫態熱傳導問題，使用有限差分法求解。
+微分方程為：dT/dt = alpha*d^2T/dx^2 + k*(Ta-T)
+網格與邊界條件和heatconduction.py相同：dx = L/(N+1)，T(0) = T0，T(L) = T1。
+時間上可使用顯式法(explicit)或Crank-Nicolson法(cn)，每一步的計算量皆為O(N)。
+當t趨近無限大時，解會收斂到heatconduction_numerical的穩態解。
+"""
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from scipy.linalg import cholesky_banded, cho_solve_banded
+import matplotlib.pyplot as plt
+from heatconduction import coefficient_banded, heatconduction_numerical
+
+def banded_matvec (ab, x):
+    """
+    帶狀格式(見coefficient_banded)的三對角矩陣乘上向量，計算量為O(N)。
+    """
+    y = ab[1]*x
+    y[:-1] += ab[0,1:]*x[1:]
+    y[1:] += ab[2,:-1]*x[:-1]
+    return y
+
+class SnapshotFile:
+    """
+    將快照依序寫入.npy檔(以memmap開啟)，記憶體中不保留任何快照。
+    path為溫度快照的檔名，形狀為(count, N+2)；
+    對應的時間在close()時存到path去掉.npy後加上_t.npy的檔案。
+    超過count個的快照會被忽略。
+    """
+    def __init__(self, path, N, count):
+        self.data = open_memmap(path, mode='w+', dtype=float, shape=(count, N+2))
+        self.time_path = path[:-4]+'_t.npy' if path.endswith('.npy') else path+'_t.npy'
+        self.times = np.zeros(count)
+        self.count = 0
+
+    def __call__(self, n, t, T):
+        if self.count < len(self.times):
+            self.data[self.count] = T
+            self.times[self.count] = t
+            self.count += 1
+
+    def close(self):
+        self.data.flush()
+        np.save(self.time_path, self.times[:self.count])
+
+def heatconduction_transient(L, T0, T1, Ta, k, N, alpha, dt, steps, scheme='cn',
+                             T_init=None, snapshot_every=0, sink=None, steady_tol=None):
+    """
+    暫態熱傳導問題的數值解，L、T0、T1、Ta、k、N與heatconduction_numerical相同，
+    alpha為熱擴散係數，dt為時間步長，steps為最多的時間步數。
+    scheme為'explicit'(顯式法，需滿足2*alpha*dt/dx^2 + k*dt <= 1)
+    或'cn'(Crank-Nicolson法，無條件穩定)。
+    T_init為內部N個點的初始溫度，預設為Ta。
+    每snapshot_every步會呼叫一次sink(n, t, T)，T為包含兩端的N+2個點，
+    sink可為任意函數或SnapshotFile；snapshot_every為0時不輸出快照。
+    若給定steady_tol，當max|dT/dt| < steady_tol時視為到達穩態並提前停止。
+    傳回最後的溫度分布(N+2個點)、時間t與實際使用的步數n。
+    """
+    # 參數設定
+    dx = L/(N+1) # 加熱桿的每一分割的長度
+    r = alpha*dt/dx**2
+    # dt乘上空間運算子：dt*(-alpha*D2 + k) = r*[-1, 2+k*dx^2/alpha, -1]
+    A = r*coefficient_banded(N, k/alpha, dx)
+    # 每一步固定的來源項：環境溫度與兩端溫度
+    s = np.repeat(k*dt*Ta, N).astype(float)
+    s[0] += r*T0
+    s[N-1] += r*T1
+    if scheme == 'explicit':
+        if 2*r + k*dt > 1:
+            raise ValueError("顯式法不穩定，dt需小於 %g" % (1/(2*alpha/dx**2 + k)))
+    elif scheme == 'cn':
+        # (I + A/2) T(n+1) = (I - A/2) T(n) + s，左邊只分解一次
+        lhs = 0.5*A[:2]
+        lhs[1] += 1
+        c = cholesky_banded(lhs)
+    else:
+        raise ValueError("未知的時間積分法: %s" % scheme)
+    T = np.zeros(N+2)
+    T[0], T[-1] = T0, T1
+    T[1:-1] = Ta if T_init is None else T_init
+    u = T[1:-1].copy()
+    if sink is not None and snapshot_every:
+        sink(0, 0.0, T)
+    n = 0
+    while n < steps:
+        if scheme == 'explicit':
+            u_new = u - banded_matvec(A, u) + s
+        else:
+            u_new = cho_solve_banded((c, False), u - 0.5*banded_matvec(A, u) + s,
+                                     check_finite=False)
+        n += 1
+        steady = steady_tol is not None and np.max(np.abs(u_new-u)) < steady_tol*dt
+        u = u_new
+        if sink is not None and snapshot_every and (n % snapshot_every == 0 or steady):
+            T[1:-1] = u
+            sink(n, n*dt, T)
+        if steady:
+            break
+    T[1:-1] = u
+    return T, n*dt, n
+
+if __name__ == '__main__':
+    T0 = 40.0 # 左端的溫度
+    T1 = 200.0 # 右端的溫度
+    Ta = 20.0 # 加熱桿本身的溫度
+    k = 0.01 # 熱傳導係數
+    N = 100 # 加熱桿的分割數
+    L = 10.0 # 加熱桿的長度
+    alpha = 1.0 # 熱擴散係數
+
+    # 以Crank-Nicolson法從T=Ta開始計算，直到到達穩態
+    snapshots = []
+    T, t, n = heatconduction_transient(L, T0, T1, Ta, k, N, alpha, dt=0.1, steps=10**5,
+                                       snapshot_every=100, steady_tol=1e-6,
+                                       sink=lambda n, t, T: snapshots.append((t, T.copy())))
+    steady = heatconduction_numerical(L, T0, T1, Ta, k, N)
+    print("在t=%g(共%d步)時到達穩態，與穩態解的最大誤差為%g" % (t, n, np.max(np.abs(T-steady))))
+
+    # 繪圖
+    x = np.linspace(0, L, N+2)
+    for t, T in snapshots[::max(1, len(snapshots)//8)]:
+        plt.plot(x, T, label='t=%g' % t)
+    plt.plot(x, steady, 'k--', label='steady')
+    plt.xlabel('x')
+    plt.ylabel('T')
+    plt.legend()
+    plt.show()
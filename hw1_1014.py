@@ -7,7 +7,9 @@
 """
 import numpy as np
 from matplotlib import pyplot as plt
+from instrument import instrument
 
+@instrument(count='f', iterations=lambda result: result[1])
 def local_maxima_golden(f, a, b, tol, max_iter):
     """
     黃金比例法求最大值
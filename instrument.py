@@ -0,0 +1,209 @@
+"""
+instrument.py
+~~~~~~~~~~~~~
+求解器的計時、函數呼叫次數與分段(例如組矩陣與求解)的紀錄。
+以@instrument裝飾求解器，在函數內以with phase('solve'):標出要分開計時的部分。
+平常(未啟用時)裝飾器只多一次旗標的判斷，phase傳回空的context manager，幾乎沒有額外負擔；
+以enable()、with recording():或環境變數NP_INSTRUMENT=1啟用後，
+每一次呼叫都會產生一筆紀錄(名稱、秒數、函數f計算的點數、迭代次數、各分段的秒數)，
+可輸出成JSON或CSV。profile則以cProfile執行一次呼叫，找出時間花在哪裡。
+"""
+
+import os
+import csv
+import json
+import time
+import inspect
+import cProfile
+import pstats
+import functools
+import numpy as np
+from contextlib import contextmanager, nullcontext
+
+ENABLED = os.environ.get('NP_INSTRUMENT') == '1'
+RECORDS = [] # 所有的紀錄
+STACK = [] # 正在執行中的紀錄(巢狀呼叫時最後一個為最內層)
+NULL_PHASE = nullcontext()
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def clear():
+    RECORDS.clear()
+
+@contextmanager
+def recording():
+    """
+    在with區塊內啟用紀錄，傳回這段期間產生的紀錄(list，區塊結束後才完整)。
+    """
+    global ENABLED
+    previous, start = ENABLED, len(RECORDS)
+    records = []
+    ENABLED = True
+    try:
+        yield records
+    finally:
+        ENABLED = previous
+        records.extend(RECORDS[start:])
+
+class Counter:
+    """
+    包住一個函數並計算呼叫次數(calls)與計算的點數(points)。
+    向量化的函數(例如simpson_vs_gauss的被積函數)一次呼叫就計算整個陣列，
+    因此點數以第一個參數的元素個數計算，純量為1。
+    """
+    def __init__(self, f):
+        self.f = f
+        self.calls = 0
+        self.points = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        self.points += np.size(args[0]) if args else 1
+        return self.f(*args, **kwargs)
+
+class Phase:
+    """
+    將with區塊的時間加到目前最內層紀錄的phases[name]。
+    """
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        phases = self.record['phases']
+        phases[self.name] = phases.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+def phase(name):
+    """
+    標出求解器內要分開計時的部分，例如with phase('assembly'):。
+    未啟用或不在@instrument的函數內時不做任何事。
+    """
+    if not ENABLED or not STACK:
+        return NULL_PHASE
+    return Phase(STACK[-1], name)
+
+def instrument(func=None, *, name=None, count=(), iterations=None):
+    """
+    裝飾器，啟用時記錄每一次呼叫。
+    count為要計算點數的函數參數名稱(例如'f')，呼叫時會被換成Counter，
+    紀錄的evaluations為f計算的點數(向量化的f一次呼叫計算多個點)；
+    iterations為由傳回值取出迭代次數的函數，例如lambda result: result[1]。
+    可以寫成@instrument或@instrument(count='f')。
+    """
+    if func is None:
+        return lambda f: instrument(f, name=name, count=count, iterations=iterations)
+    label = name or '%s.%s' % (func.__module__, func.__qualname__)
+    count = (count,) if isinstance(count, str) else tuple(count)
+    parameters = list(inspect.signature(func).parameters)
+    positions = {c: parameters.index(c) for c in count}
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return func(*args, **kwargs)
+        counters = []
+        if count:
+            args = list(args)
+            for c, i in positions.items():
+                if i < len(args):
+                    args[i] = Counter(args[i])
+                    counters.append(args[i])
+                elif c in kwargs:
+                    kwargs[c] = Counter(kwargs[c])
+                    counters.append(kwargs[c])
+        record = {'name': label, 'depth': len(STACK), 'seconds': 0.0,
+                  'evaluations': None, 'iterations': None, 'phases': {}}
+        STACK.append(record)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            STACK.pop()
+            RECORDS.append(record)
+        if counters:
+            record['evaluations'] = sum(counter.points for counter in counters)
+        if iterations is not None:
+            record['iterations'] = iterations(result)
+        return result
+    return wrapper
+
+def export_json(path, records=None):
+    """
+    將紀錄存成JSON(一個list)。
+    """
+    with open(path, 'w') as f:
+        json.dump(RECORDS if records is None else records, f, indent=1)
+
+def export_csv(path, records=None):
+    """
+    將紀錄存成CSV，每一個分段為一個phase:名稱欄位。
+    """
+    records = RECORDS if records is None else records
+    phases = sorted({name for record in records for name in record['phases']})
+    fields = ['name', 'depth', 'seconds', 'evaluations', 'iterations']
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(fields + ['phase:' + name for name in phases])
+        for record in records:
+            writer.writerow([record[field] for field in fields]
+                            + [record['phases'].get(name, '') for name in phases])
+
+def summary(records=None):
+    """
+    依名稱合計呼叫次數、總秒數與函數計算的點數，傳回{名稱: dict}。
+    """
+    totals = {}
+    for record in RECORDS if records is None else records:
+        total = totals.setdefault(record['name'], {'calls': 0, 'seconds': 0.0, 'evaluations': 0})
+        total['calls'] += 1
+        total['seconds'] += record['seconds']
+        total['evaluations'] += record['evaluations'] or 0
+    return totals
+
+def profile(func, *args, path=None, sort='cumulative', limit=20, **kwargs):
+    """
+    以cProfile執行func(*args, **kwargs)並印出最耗時的limit個函數。
+    給定path時另外把原始的統計資料存檔(可用snakeviz等工具查看)。
+    傳回func的傳回值與pstats.Stats。
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    if path is not None:
+        profiler.dump_stats(path)
+    stats = pstats.Stats(profiler).sort_stats(sort)
+    stats.print_stats(limit)
+    return result, stats
+
+if __name__ == '__main__':
+    # 以python instrument.py執行時，這個檔案是__main__，求解器用的是另一份instrument模組
+    from instrument import recording, summary, profile
+    from heatconduction import heatconduction_numerical
+    from simpson_vs_gauss import simpson, gauss, f
+    from muller_root_finished import all_root, test_case
+
+    with recording() as records:
+        for method in ('cholesky', 'banded', 'thomas', 'sparse'):
+            heatconduction_numerical(10.0, 40.0, 200.0, 20.0, 0.01, 10**5, method=method)
+        simpson(f, 0, 10, 1000)
+        gauss(f, 0, 10, 10)
+        all_root(test_case, -20, 20, 1e-4)
+    for record in records:
+        phases = ', '.join('%s %.4f秒' % item for item in record['phases'].items())
+        print("%s%s：%.4f秒，f計算%s個點，%s" % ('  '*record['depth'], record['name'],
+                                          record['seconds'], record['evaluations'], phases))
+    for name, total in summary(records).items():
+        print(name, total)
+    profile(heatconduction_numerical, 10.0, 40.0, 200.0, 20.0, 0.01, 10**5,
+            method='thomas', limit=5)
@@ -0,0 +1,113 @@
+"""
+jit_kernels.py
+~~~~~~~~~~~~~~
+以Numba的njit把找根、找極值與辛普森積分的迴圈與目標函數一起編譯。
+binary_root.one_root、find_integer、all_root，local_extreme_bisect.local_extreme，
+local_extreme_golden.local_minima_golden與simpson_int.simpson都有jit參數(預設False)：
+每一次迭代都要呼叫一次Python函數f，計算便宜的f(例如test_case)時，時間幾乎都花在函數呼叫上；
+jit=True時這些函數把自己的迴圈(與jit=False時執行的是同一個函數)交給run，
+連同以accelerate編譯的f一起在機器碼中執行，傳回值與jit=False時相同。
+沒有安裝numba、環境變數NP_JIT=0，或f無法編譯(例如instrument計算呼叫次數時的Counter，
+或numba不支援的Python物件)時，run直接執行原本的Python迴圈。numba只在第一次需要編譯時才載入。
+"""
+
+import os
+import time
+import math
+import types
+import warnings
+import functools
+import importlib.util
+import numpy as np
+
+NUMBA = os.environ.get('NP_JIT') != '0' and importlib.util.find_spec('numba') is not None
+
+@functools.lru_cache(maxsize=None)
+def compiled(loop):
+    """
+    以njit編譯迴圈函數loop(只用於模組中定義的迴圈，結果保留到程式結束)。
+    """
+    from numba import njit
+    return njit(loop)
+
+def is_compiled(f):
+    """
+    f是否已經是numba編譯過的函數。
+    """
+    return NUMBA and type(f).__module__.startswith('numba')
+
+@functools.lru_cache(maxsize=64)
+def accelerate(f):
+    """
+    編譯目標函數f(需只使用numba支援的運算，例如math與numpy的純量函數)。
+    編譯後的f一律以float呼叫：Python的整數不會溢位，編譯後的int64會，
+    例如binary_root.test_case在|x|=2000時f(i)*f(i+1)就超過int64；
+    同一個f以int與float呼叫時numba也無法直接呼叫，實測慢了約50倍。
+    同一個f只編譯一次；沒有numba或f無法編譯時傳回原本的f。
+    """
+    if not NUMBA or not (is_compiled(f) or isinstance(f, types.FunctionType)):
+        return f
+    from numba import njit
+    g = f if is_compiled(f) else njit(f)
+    return njit(lambda x: g(float(x)))
+
+FAILED = set() # 無法編譯的目標函數f，之後直接執行Python迴圈，不再嘗試編譯
+
+def run(loop, f, *args, jit=False):
+    """
+    執行loop(f, *args)。jit為True且f可以編譯時，loop與f都先以numba編譯。
+    numba在第一次呼叫時才編譯，f無法編譯(例如讀取全域的dict)時numba會產生NumbaError，
+    此時記住這個f(迴圈本身都可以編譯)並改為執行Python迴圈。
+    """
+    if jit and f not in FAILED:
+        g = accelerate(f)
+        if is_compiled(g):
+            from numba.core.errors import NumbaError
+            try:
+                return compiled(loop)(g, *args)
+            except NumbaError as error:
+                FAILED.add(f)
+                warnings.warn("%s無法以numba編譯，改用Python迴圈：%s"
+                              % (getattr(f, '__name__', f), str(error).splitlines()[0]))
+    return loop(f, *args)
+
+def benchmark(repeat=5, number=100):
+    """
+    比較jit=False與jit=True，第一次呼叫(編譯)不計時，每次計時連續呼叫number次，
+    取repeat次中最快的一次。傳回{名稱: (原本每次呼叫的秒數, 編譯後每次呼叫的秒數)}。
+    從Python呼叫編譯後的函數本身約有幾微秒的負擔，只迭代幾次的問題
+    (例如這裡的local_minima_golden)不會變快，迭代與函數呼叫越多，加速越明顯。
+    """
+    import binary_root
+    import local_extreme_bisect
+    import local_extreme_golden
+    import simpson_int
+    parabola = lambda x: (x-3)**2 + 1
+    cases = {
+        'all_root': (binary_root.all_root, binary_root.test_case, (-2000, 2000, 1e-12)),
+        'local_extreme': (local_extreme_bisect.local_extreme, lambda x: -(x-3)**2+1,
+                          (-20.0, 20.0, 1e-12, 100)),
+        'local_minima_golden': (local_extreme_golden.local_minima_golden, parabola,
+                                (-20.0, 20.0, 1e-12, 100)),
+        'simpson': (simpson_int.simpson, lambda x: math.sin(x), (0.0, math.pi, 10**5)),
+    }
+    results = {}
+    for name, (solver, f, args) in cases.items():
+        solver(f, *args, jit=True) # 編譯
+        timings = []
+        for jit in (False, True):
+            best = np.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for _ in range(number):
+                    solver(f, *args, jit=jit)
+                best = min(best, (time.perf_counter()-start)/number)
+            timings.append(best)
+        results[name] = tuple(timings)
+    return results
+
+if __name__ == '__main__':
+    print("numba:", "已啟用" if NUMBA else "沒有安裝，使用純Python")
+    for name, (python, kernel) in benchmark().items():
+        print("%-20s Python %10.2f微秒  kernel %10.2f微秒  加速 %.1f倍"
+              % (name, python*1e6, kernel*1e6, python/kernel))
@@ -4,29 +4,128 @@
     用最小平方法對特定資料點進行二次函數近似，並繪製出來。
     Using least square method to approximate the function as a parabolic function.
     Created by Chang Kai-Po @ Jian Lab, NCTU, Taiwan, on 2023/4/6.    
+
+    fit可用任意次數的多項式或任意基底函數，以QR分解求解，不計算(A^T A)^-1：
+    正規方程式的條件數是A的平方，而x約為200時x^2那一行與常數行差了四個數量級，
+    因此多項式先把x縮放到[-1, 1]再建立Vandermonde矩陣。
+    StreamingFit則一次讀入一段資料並更新R(遞增的QR分解)，
+    記憶體用量只和參數個數有關，可以擬合存在檔案或memmap中的上百萬個點。
 """
 import numpy as np 
+from scipy.linalg import solve_triangular
 from matplotlib import pyplot as plt
 
+def scaled_vandermonde(x, degree, domain):
+    """
+    縮放後的Vandermonde矩陣，第j行為t^j(j = 0...degree)，
+    t = (x - center)/half，domain = (xmin, xmax)對應到t = -1與t = 1。
+    """
+    center, half = (domain[0]+domain[1])/2, (domain[1]-domain[0])/2 or 1.0
+    t = (np.asarray(x, dtype=float) - center)/half
+    return t[:, np.newaxis]**np.arange(degree+1)
+
+def unscale(coefficients, domain):
+    """
+    把t的多項式係數(由低次到高次)換回x的多項式係數(由低次到高次)。
+    """
+    center, half = (domain[0]+domain[1])/2, (domain[1]-domain[0])/2 or 1.0
+    t = np.polynomial.Polynomial([-center/half, 1/half])
+    return np.polynomial.Polynomial(coefficients)(t).coef[:len(coefficients)]
+
+def design_matrix(x, degree=2, basis=None, domain=None):
+    """
+    最小平方法的設計矩陣。basis為函數的串列(例如[np.ones_like, np.sin, np.cos])時，
+    第j行為basis[j](x)；否則為degree次多項式的縮放Vandermonde矩陣(見scaled_vandermonde)。
+    """
+    if basis is not None:
+        return np.column_stack([f(np.asarray(x, dtype=float)) for f in basis])
+    return scaled_vandermonde(x, degree, domain)
+
+def fit(x, y, degree=2, basis=None, domain=None):
+    """
+    以QR分解求min ||A c - y||，A見design_matrix。
+    多項式時domain預設為(min(x), max(x))，傳回x的多項式係數(由低次到高次，
+    與np.polynomial.polynomial相同)；給定basis時傳回每一個基底函數的係數。
+    """
+    if basis is None and domain is None:
+        domain = (np.min(x), np.max(x))
+    A = design_matrix(x, degree, basis, domain)
+    Q, R = np.linalg.qr(A)
+    c = solve_triangular(R, Q.T @ np.asarray(y, dtype=float))
+    return c if basis is not None else unscale(c, domain)
+
+class StreamingFit:
+    """
+    分段讀入資料的最小平方法。保留上三角矩陣R與z = Q^T y：
+    每讀入一段(A_k, y_k)，就對[R; A_k]做QR分解得到新的R與z，
+    因此記憶體用量與資料點數無關，且不需要形成A^T A。
+    多項式需要事先給定domain(見scaled_vandermonde)，
+    只要大致涵蓋資料的範圍即可，不需要精確的最小、最大值。
+    """
+    def __init__(self, degree=2, basis=None, domain=(-1.0, 1.0)):
+        self.degree = degree
+        self.basis = basis
+        self.domain = domain
+        p = degree+1 if basis is None else len(basis)
+        self.R = np.zeros((0, p))
+        self.z = np.zeros(0)
+        self.count = 0
+        self.rss = 0.0 # 殘差平方和
+
+    def update(self, x, y):
+        """
+        加入一段資料點。
+        """
+        A = np.vstack([self.R, design_matrix(x, self.degree, self.basis, self.domain)])
+        b = np.concatenate([self.z, np.asarray(y, dtype=float)])
+        Q, self.R = np.linalg.qr(A)
+        z = Q.T @ b
+        # 這一段新增的殘差為||b||^2 - ||Q^T b||^2
+        self.rss += max(b @ b - z @ z, 0.0)
+        self.z = z
+        self.count += len(y)
+        return self
+
+    def coefficients(self):
+        """
+        目前為止所有資料的最小平方解，格式與fit相同。
+        """
+        c = solve_triangular(self.R, self.z)
+        return c if self.basis is not None else unscale(c, self.domain)
+
+def fit_stream(x, y, degree=2, basis=None, domain=None, chunk=2**16):
+    """
+    以StreamingFit每次讀入chunk個點擬合，x、y可為np.load(..., mmap_mode='r')的memmap，
+    每次只有一段會被讀進記憶體。domain預設為第一段的(min, max)。
+    傳回係數(格式與fit相同)與殘差平方和。
+    """
+    if basis is None and domain is None:
+        domain = (np.min(x[:chunk]), np.max(x[:chunk]))
+    stream = StreamingFit(degree, basis, domain)
+    for start in range(0, len(x), chunk):
+        stream.update(x[start:start+chunk], y[start:start+chunk])
+    return stream.coefficients(), stream.rss
+
 def main():
     # 資料點，來自https://zh.wikipedia.org/zh-tw/%E6%9C%80%E5%B0%8F%E4%BA%8C%E4%B9%98%E6%B3%95
     x = np.array([208, 152, 113, 227, 137, 238, 178, 104, 191, 130])
     y = np.array([21.6, 15.5, 10.4, 31.0, 13.0, 32.4, 19.0, 10.4, 19.0, 11.8])
     
-    # 排序
-    x = np.sort(x)
-    y = np.sort(y)
+    # 依x排序(y要跟著x一起排，才不會打亂資料點的對應)
+    order = np.argsort(x)
+    x, y = x[order], y[order]
     
-    # 計算最小平方法的係數
-    A = np.vstack([x**2, x, np.ones(len(x))])
-    # 通解為a = (A^T*A)^-1*A^T*y
-    # 所以先計算X^T*X的逆矩陣
-    B = np.linalg.inv(np.dot(A, A.T))
-    # 最後計算通解
-    a = np.dot(B, np.dot(A, y))
-    m, c, b = a
+    # 計算最小平方法的係數(QR分解，x先縮放到[-1, 1])
+    b, c, m = fit(x, y, degree=2)
     print("二次曲線近似為y=", m, "* x^2 + ", c, "* x + ", b, sep="")
 
+    # 分段擬合：一百萬個點，每次只讀入65536個
+    rng = np.random.default_rng(0)
+    big_x = rng.uniform(100, 250, 10**6)
+    big_y = m*big_x**2 + c*big_x + b + rng.normal(0, 1, len(big_x))
+    coefficients, rss = fit_stream(big_x, big_y, degree=2)
+    print("分段擬合一百萬個點:", coefficients[::-1], "殘差的標準差:", np.sqrt(rss/len(big_x)))
+
     # 繪製圖形
     plt.plot(x, y, 'o', label='Original data', markersize=10)
     plt.plot(x, m*x**2 + c*x + b, 'r', label='Fitted line')
@@ -8,10 +8,22 @@
 """
 import numpy as np
 import matplotlib.pyplot as plt
+from instrument import instrument
+from jit_kernels import run
 
-def local_extreme(f, a, b, tol, max_iter):
+@instrument(count='f', iterations=lambda result: result[1])
+def local_extreme(f, a, b, tol, max_iter, jit=False):
     """
     Find local maxima and local minima of a function f by bisection method.
+    jit=True時以numba編譯迴圈與f(見jit_kernels)，a與b轉成float。
+    """
+    if jit:
+        a, b = float(a), float(b)
+    return run(extreme_loop, f, a, b, tol, max_iter, jit=jit)
+
+def extreme_loop(f, a, b, tol, max_iter):
+    """
+    local_extreme的迴圈。
     """
     # 設定初始點
     x1, x2 = a, b
@@ -9,10 +9,22 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
+from instrument import instrument
+from jit_kernels import run
 
-def local_minima_golden(f, a, b, tol, max_iter):
+@instrument(count='f', iterations=lambda result: result[1])
+def local_minima_golden(f, a, b, tol, max_iter, jit=False):
     """
     Find local minima of a function f by golden section method, without use of differential.
+    jit=True時以numba編譯迴圈與f(見jit_kernels)，a與b轉成float。
+    """
+    if jit:
+        a, b = float(a), float(b)
+    return run(minima_loop, f, a, b, tol, max_iter, jit=jit)
+
+def minima_loop(f, a, b, tol, max_iter):
+    """
+    local_minima_golden的迴圈。
     """
     # 設定初始點
     x_low, x_high = a, b
@@ -33,6 +45,7 @@ def local_minima_golden(f, a, b, tol, max_iter):
         iter += 1
     return x_low, iter
 
+@instrument(count='f', iterations=lambda result: result[1])
 def local_maxima_golden(f, a, b, tol, max_iter):
     """
     Find local maxima of a function f by golden section method, without use of differential.
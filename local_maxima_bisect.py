@@ -6,7 +6,9 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
+from instrument import instrument
 
+@instrument(count='f', iterations=lambda result: result[1])
 def local_extreme(f, a, b, tol, max_iter):
     """
     Find local maxima and local minima of a function f by bisection method.
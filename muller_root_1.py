@@ -4,6 +4,7 @@
     註: 如果兩個整數之間有超過一個根，那這支沒辦法解。
     Chang Kai-Po @ Jian Lab 2023/03/03
 """
+from instrument import instrument
 
 def test_case (x):  #用來測試的函數
     y = x**4 + x**3 - 2*x**2 + x - 6
@@ -32,6 +33,7 @@ def muller_core (f, x0, x1, x2):
     h = -2*f(x2)/E
     return x2 + h
 
+@instrument(count='f')
 def muller_root (f, x0, epsilon):
     """
     給予兩個從小到大的x值: x0, x2，並且f(x0)與f(x2)之間有根
@@ -70,6 +72,7 @@ def secant_root (f, i, epsilon):
             low = mid;                 #中間值變成下界
     return mid                         #以下界為根 
 
+@instrument(count='f')
 def all_root (f, low, high, epsilon):
     """
       以low為下界, high為上界，搜尋函數f(x)在這個範圍內可能的根，
@@ -84,4 +87,5 @@ def all_root (f, low, high, epsilon):
         li.append(muller_root (f, item, epsilon))
     return li
 
-print(all_root(test_case, -20, 20, 0.0001))
\ No newline at end of file
+if __name__ == '__main__':
+    print(all_root(test_case, -20, 20, 0.0001))
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+nonlinear_fit.py
+~~~~~~~~~~~~~~~~
+以Levenberg-Marquardt法擬合參數為非線性的模型，例如population.logistic的(y0, k, c)
+或heatconduction_analytical的加熱桿溫度分布。
+模型寫成model(t, p1, p2, ...)，參數為形狀(B, 1)的陣列，依broadcasting傳回(B, M)，
+因此B組互相獨立的資料可以一起擬合：每次迭代只呼叫模型P+1次(有限差分Jacobian)，
+法方程式以批次的np.linalg.solve一次求解，沒有逐組的Python迴圈。
+結果包含殘差、卡方值與參數的共變異數矩陣。
+"""
+
+import numpy as np
+from matplotlib import pyplot as plt
+from population import logistic, logistic_jacobian
+from heatconduction import heatconduction_analytical
+
+def finite_difference_jacobian(model, t, params, f0=None):
+    """
+    前向差分的Jacobian，params形狀為(B, P)，傳回(B, M, P)。
+    每一個參數只擾動一次(所有資料組一起)，共呼叫模型P次，
+    步長為sqrt(eps)*max(|p|, 1)。
+    """
+    if f0 is None:
+        f0 = evaluate(model, t, params)
+    step = np.sqrt(np.finfo(float).eps)*np.maximum(np.abs(params), 1.0)
+    J = np.empty(f0.shape + (params.shape[1],))
+    for j in range(params.shape[1]):
+        shifted = params.copy()
+        shifted[:, j] += step[:, j]
+        J[..., j] = (evaluate(model, t, shifted) - f0)/step[:, j, np.newaxis]
+    return J
+
+def evaluate(model, t, params):
+    """
+    以形狀(B, P)的參數呼叫model(t, p1, ..., pP)，每一個參數為(B, 1)，傳回(B, M)。
+    """
+    return np.broadcast_to(model(t, *params.T[:, :, np.newaxis]), (len(params), np.shape(t)[-1]))
+
+def levenberg_marquardt(model, t, y, p0, jacobian=None, sigma=None, max_iter=200,
+                        tol=1e-10, lam=1e-3):
+    """
+    以Levenberg-Marquardt法求min sum ((y - model(t, *p))/sigma)^2。
+    y為(M,)或B組資料(B, M)，p0為(P,)或(B, P)(只給一組時所有資料組共用初始值)，
+    t為(M,)或(B, M)。jacobian(t, *p)若給定需傳回(B, M, P)的解析Jacobian，
+    否則使用finite_difference_jacobian。
+    每一組資料各自有阻尼係數lam：步驟被接受時除以10，否則乘以10；
+    相對的卡方值變化小於tol時該組停止迭代，只剩下還沒收斂的資料組繼續計算。
+    傳回參數，以及包含residuals(y - model)、chi2、covariance
+    (卡方值/(M-P)乘上(J^T J)^-1，給定sigma時不乘)、iterations與converged的dict。
+    y為一維時傳回值也不含批次的維度。
+    """
+    single = np.ndim(y) == 1
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    B, M = y.shape
+    params = np.array(np.broadcast_to(np.atleast_2d(p0), (B, np.shape(p0)[-1])), dtype=float)
+    P = params.shape[1]
+    t = np.asarray(t, dtype=float)
+    weight = 1/np.broadcast_to(1.0 if sigma is None else np.asarray(sigma, dtype=float), (B, M))
+    lam = np.full(B, float(lam))
+    iterations = np.zeros(B, dtype=int)
+    converged = np.zeros(B, dtype=bool)
+
+    def subset(index):
+        return t if t.ndim == 1 else t[index]
+
+    def jacobian_of(index, p, f):
+        if jacobian is not None:
+            J = jacobian(subset(index), *p.T[:, :, np.newaxis])
+            return np.broadcast_to(J, (len(p), M, P))
+        return finite_difference_jacobian(model, subset(index), p, f)
+
+    f = evaluate(model, t, params).copy()
+    chi2 = np.sum(((y - f)*weight)**2, axis=1)
+    active = np.arange(B)
+    for _ in range(max_iter):
+        if len(active) == 0:
+            break
+        p, w = params[active], weight[active]
+        r = (y[active] - f[active])*w
+        J = jacobian_of(active, p, f[active])*w[:, :, np.newaxis]
+        JTJ = np.einsum('bmi,bmj->bij', J, J)
+        g = np.einsum('bmi,bm->bi', J, r)
+        # Marquardt的阻尼：lam乘上JTJ的對角線，參數的尺度不同時也適用
+        D = np.einsum('bii->bi', JTJ)
+        A = JTJ + (lam[active, np.newaxis]*np.maximum(D, 1e-300))[:, :, np.newaxis]*np.eye(P)
+        try:
+            step = np.linalg.solve(A, g[:, :, np.newaxis])[:, :, 0]
+        except np.linalg.LinAlgError:
+            step = np.stack([np.linalg.lstsq(a, b, rcond=None)[0] for a, b in zip(A, g)])
+        trial = p + step
+        f_trial = evaluate(model, subset(active), trial)
+        chi2_trial = np.sum(((y[active] - f_trial)*w)**2, axis=1)
+        accept = np.isfinite(chi2_trial) & (chi2_trial < chi2[active])
+        iterations[active] += 1
+        done = accept & (chi2[active] - chi2_trial <= tol*np.maximum(chi2_trial, 1e-300))
+        done |= np.all(np.abs(step) <= tol*np.maximum(np.abs(p), 1e-300), axis=1)
+        update = active[accept]
+        params[update] = trial[accept]
+        f[update] = f_trial[accept]
+        chi2[update] = chi2_trial[accept]
+        lam[active] = np.where(accept, lam[active]/10, lam[active]*10)
+        converged[active[done]] = True
+        active = active[~done & (lam[active] < 1e16)]
+
+    J = jacobian_of(np.arange(B), params, f)*weight[:, :, np.newaxis]
+    JTJ = np.einsum('bmi,bmj->bij', J, J)
+    covariance = np.linalg.pinv(JTJ)
+    if sigma is None:
+        covariance = covariance*(chi2/max(M-P, 1))[:, np.newaxis, np.newaxis]
+    info = {'residuals': y - f, 'chi2': chi2, 'covariance': covariance,
+            'iterations': iterations, 'converged': converged}
+    if single:
+        info = {name: value[0] for name, value in info.items()}
+        return params[0], info
+    return params, info
+
+def heat_rod(x, T0, T1, Ta, k, L=10.0):
+    """
+    heatconduction_analytical的加熱桿溫度分布，寫成levenberg_marquardt的模型形式。
+    """
+    return heatconduction_analytical(L, T0, T1, Ta, k, 0, x=x)
+
+if __name__ == '__main__':
+    import time
+    rng = np.random.default_rng(0)
+
+    # 1000組人口資料，每組的(y0, k, c)不同，並加上1%的雜訊
+    t = np.linspace(0, 50, 60)
+    truth = np.column_stack([rng.uniform(0.5, 2, 1000), rng.uniform(0.05, 0.2, 1000),
+                             rng.uniform(0.005, 0.02, 1000)])
+    clean = evaluate(logistic, t, truth)
+    data = clean*(1 + 0.01*rng.standard_normal(clean.shape))
+    for name, jac in (('有限差分', None), ('解析', logistic_jacobian)):
+        start = time.perf_counter()
+        params, info = levenberg_marquardt(logistic, t, data, (1.0, 0.1, 0.01), jacobian=jac)
+        print("%s Jacobian：1000組共%.3f秒，收斂%d組，參數的最大相對誤差中位數%.3g"
+              % (name, time.perf_counter()-start, np.sum(info['converged']),
+                 np.median(np.max(np.abs(params/truth-1), axis=1))))
+    error = np.sqrt(np.einsum('bii->bi', info['covariance']))
+    print("第一組：參數", params[0], "標準差", error[0], "真值", truth[0])
+
+    # 加熱桿：由量到的溫度分布估計兩端溫度、環境溫度與k(k太小時Ta幾乎無法決定)
+    x = np.linspace(0, 10, 40)
+    measured = heat_rod(x, 40.0, 200.0, 20.0, 0.1) + rng.normal(0, 0.5, len(x))
+    p, info = levenberg_marquardt(heat_rod, x, measured, (30.0, 180.0, 10.0, 0.05))
+    print("加熱桿(T0, T1, Ta, k) =", p, "標準差", np.sqrt(np.diag(info['covariance'])))
+
+    # 多根加熱桿一起擬合：k為(B, 1)的陣列，heatconduction_analytical依broadcasting計算
+    rods = np.array([[40.0, 200.0, 20.0, 0.1], [30.0, 150.0, 25.0, 0.05], [50.0, 100.0, 10.0, 0.2]])
+    data = heat_rod(x, *rods.T[:, :, np.newaxis]) + rng.normal(0, 0.5, (len(rods), len(x)))
+    fitted, info = levenberg_marquardt(heat_rod, x, data, (30.0, 180.0, 10.0, 0.05))
+    print("%d根加熱桿一起擬合，收斂%d根，k =" % (len(rods), np.sum(info['converged'])), fitted[:, 3])
+
+    plt.plot(x, measured, 'o', label='measured')
+    plt.plot(x, heat_rod(x, *p), label='fit')
+    plt.xlabel('x')
+    plt.ylabel('T')
+    plt.legend()
+    plt.show()
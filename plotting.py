@@ -0,0 +1,164 @@
+"""
+plotting.py
+~~~~~~~~~~~
+大量資料點的繪圖。
+10^6個點的軌跡或波函數直接交給matplotlib時，畫圖比求解還慢，
+但螢幕上一條線只有幾百個像素寬。plot先把x的範圍等分成與座標軸寬度(像素)相同數目的區段，
+每段只保留最小值與最大值(依原本的順序)，畫出來的線與完整資料在螢幕上看起來相同，
+尖峰也不會被抹掉。
+show取代plt.show()：設定輸出目錄(save_to或環境變數NP_PLOT_DIR)後，
+改用不需要視窗的Agg後端，把圖存成PNG或SVG(NP_PLOT_FORMAT)而不是開視窗等待。
+render_parallel在多個行程中同時產生並存檔一次參數掃描的所有圖。
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import matplotlib
+
+OUTPUT = {'directory': os.environ.get('NP_PLOT_DIR'),
+          'format': os.environ.get('NP_PLOT_FORMAT', 'png'), 'count': 0}
+if OUTPUT['directory']:
+    matplotlib.use('Agg')
+from matplotlib import pyplot as plt
+
+def minmax_decimate(x, y, bins):
+    """
+    將x的範圍等分成bins段(plot時每段為一個像素寬)，每段保留最小值與最大值的位置
+    (再加上第一個與最後一個點)，傳回抽樣後的(x, y)，最多2*bins+2個點。
+    點數不到2*bins時直接傳回原本的資料。x需為遞增(或遞減)，否則不抽樣。
+    NaN不算最小值或最大值；有NaN的段另外保留第一個NaN，畫出來的線仍會在該處斷開，
+    全部都是NaN的段也不會出錯。
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    n = len(y)
+    if bins <= 0 or n <= 2*bins:
+        return x, y
+    step = np.diff(x)
+    if np.all(step <= 0) and not np.all(step >= 0):
+        x_kept, y_kept = minmax_decimate(x[::-1], y[::-1], bins)
+        return x_kept[::-1], y_kept[::-1]
+    if not np.all(step >= 0):
+        return x, y
+    edges = np.linspace(x[0], x[-1], bins+1)
+    bounds = np.concatenate(([0], np.searchsorted(x, edges[1:-1]), [n]))
+    lengths = np.diff(bounds)
+    starts = bounds[:-1][lengths > 0] # 沒有點的段不算
+    segment = np.repeat(np.arange(len(starts)), lengths[lengths > 0])
+    keep = [[0, n-1]]
+    for extreme in (np.fmin.reduceat(y, starts), np.fmax.reduceat(y, starts)):
+        # 每段中等於最小值(最大值)的第一個點；全為NaN的段沒有相等的點，會被略過
+        hit = np.flatnonzero(y == extreme[segment])
+        keep.append(hit[np.unique(segment[hit], return_index=True)[1]])
+    missing = np.flatnonzero(np.isnan(y)) if y.dtype.kind == 'f' else np.empty(0, int)
+    keep.append(missing[np.unique(segment[missing], return_index=True)[1]])
+    keep = np.unique(np.concatenate(keep))
+    return x[keep], y[keep]
+
+def pixels(ax):
+    """
+    座標軸的寬度(像素)。
+    """
+    return max(int(ax.get_window_extent().width), 1)
+
+def plot(*args, ax=None, bins=None, **kwargs):
+    """
+    與plt.plot(y)、plt.plot(x, y)、plt.plot(x, y, fmt)相同，但先以minmax_decimate抽樣，
+    bins預設為座標軸的寬度(像素)。y為二維時每一行分別抽樣，畫成多條線。
+    ax預設為plt.gca()，傳回Line2D的list。
+    """
+    ax = plt.gca() if ax is None else ax
+    args = list(args)
+    if len(args) == 1 or isinstance(args[1], str):
+        y = np.asarray(args.pop(0))
+        x = np.arange(len(y))
+    else:
+        x, y = np.asarray(args.pop(0)), np.asarray(args.pop(0))
+    bins = pixels(ax) if bins is None else bins
+    lines = []
+    columns = [y] if y.ndim == 1 else y.T
+    for column in columns:
+        lines += ax.plot(*minmax_decimate(x, column, bins), *args, **kwargs)
+    return lines
+
+def save_to(directory, format='png'):
+    """
+    之後的show()改為把圖存到directory(不開視窗)；directory為None時恢復plt.show()。
+    """
+    OUTPUT.update(directory=directory, format=format)
+    if directory is not None:
+        plt.switch_backend('Agg')
+
+def show(name=None, fig=None):
+    """
+    取代plt.show()。沒有設定輸出目錄時就是plt.show()；
+    否則把fig(預設為所有開啟的圖)存成 目錄/name.格式 並關閉，
+    name預設為執行的腳本名稱加上編號。傳回存檔的路徑。
+    """
+    if OUTPUT['directory'] is None:
+        plt.show()
+        return []
+    os.makedirs(OUTPUT['directory'], exist_ok=True)
+    figures = [fig] if fig is not None else [plt.figure(n) for n in plt.get_fignums()]
+    if name is None:
+        name = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'figure'
+    paths = []
+    for figure in figures:
+        OUTPUT['count'] += 1
+        path = os.path.join(OUTPUT['directory'], '%s_%d.%s' % (name, OUTPUT['count'], OUTPUT['format']))
+        figure.savefig(path)
+        plt.close(figure)
+        paths.append(path)
+    return paths
+
+def render_one(draw, item, path):
+    """
+    在工作行程中以Agg後端呼叫draw(item)(傳回Figure)並存檔。
+    """
+    plt.switch_backend('Agg')
+    figure = draw(item)
+    figure.savefig(path)
+    plt.close(figure)
+    return path
+
+def render_parallel(draw, items, directory, workers=None, format='png', names=None):
+    """
+    對每一個item在ProcessPoolExecutor中呼叫draw(item)並存成 directory/名稱.格式，
+    名稱預設為編號。draw需定義在模組的最上層。傳回存檔的路徑(順序與items相同)。
+    """
+    os.makedirs(directory, exist_ok=True)
+    items = list(items)
+    names = ['%04d' % i for i in range(len(items))] if names is None else names
+    paths = [os.path.join(directory, '%s.%s' % (name, format)) for name in names]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(render_one, [draw]*len(items), items, paths))
+
+def wave_figure(k):
+    """
+    render_parallel的範例：sin(kx)乘上雜訊，10^6個點。
+    """
+    x = np.linspace(0, 1, 10**6)
+    y = np.sin(k*x) + 0.1*np.random.default_rng(k).standard_normal(len(x))
+    figure, ax = plt.subplots()
+    plot(x, y, ax=ax, linewidth=0.5)
+    ax.set_title('k=%d' % k)
+    return figure
+
+if __name__ == '__main__':
+    import time
+    import tempfile
+    matplotlib.use('Agg')
+    x = np.linspace(0, 1, 10**6)
+    y = np.sin(40*x) + 0.1*np.random.default_rng(0).standard_normal(len(x))
+    for label, draw in (('完整資料', lambda ax: ax.plot(x, y)), ('抽樣', lambda ax: plot(x, y, ax=ax))):
+        figure, ax = plt.subplots()
+        start = time.perf_counter()
+        draw(ax)
+        figure.savefig(os.path.join(tempfile.gettempdir(), 'plotting_demo.png'))
+        plt.close(figure)
+        print("%s：%.3f秒" % (label, time.perf_counter()-start))
+    directory = os.path.join(tempfile.gettempdir(), 'plotting_sweep')
+    start = time.perf_counter()
+    paths = render_parallel(wave_figure, range(1, 9), directory, workers=2)
+    print("平行產生%d張圖：%.2f秒，存在%s" % (len(paths), time.perf_counter()-start, directory))
@@ -14,7 +14,10 @@
     Chang Kai-Po @ Jian Lab 2023/03/13
 """
 import math
+import numpy as np
 import matplotlib.pyplot as plt
+from instrument import instrument
+from plotting import plot, show
 
 def finit_diff(y, k, c, h):
     """
@@ -24,6 +27,7 @@ def finit_diff(y, k, c, h):
     """
     return (1+h*k)*y - h*c*y**2
 
+@instrument(iterations=lambda y: len(y)-1)
 def ranged_finit_diff (y0, xlow, xhigh, k, c, h):
     """
     透過有限差分計算此微分方程在在xlow與xhigh此一範圍之間的估計值。
@@ -51,14 +55,32 @@ def ranged_exact_sol(y0, xlow, xhigh, k, c, h):
     #print(y)        
     return y
 
+def logistic(t, y0, k, c):
+    """
+    精確解y(t) = k*y0/((k-c*y0)*exp(-kt) + c*y0)的向量化版本，
+    t與參數可為numpy陣列(依broadcasting規則)，供nonlinear_fit擬合使用。
+    """
+    E = np.exp(-k*t)
+    return k*y0/((k-c*y0)*E + c*y0)
+
+def logistic_jacobian(t, y0, k, c):
+    """
+    logistic對(y0, k, c)的偏微分，最後一維依序為dy/dy0、dy/dk、dy/dc。
+    """
+    E = np.exp(-k*t)
+    D = (k-c*y0)*E + c*y0
+    return np.stack(np.broadcast_arrays(k**2*E/D**2,
+                                        y0*(D - k*(E - (k-c*y0)*t*E))/D**2,
+                                        -k*y0**2*(1-E)/D**2), axis=-1)
+
 def plot_finit_diff(y0, xlow, xhigh, k, c, h):
     """
     繪製有限差分的結果。
     """
     y = ranged_finit_diff(y0, xlow, xhigh, k, c, h)
     x = [xlow + i*h for i in range(len(y))]
-    plt.plot(x, y)
-    plt.show()
+    plot(x, y)
+    show()
 
 def plot_exact_sol(y0, xlow, xhigh, k, c, h):
     """
@@ -66,8 +88,8 @@ def plot_exact_sol(y0, xlow, xhigh, k, c, h):
     """
     y= ranged_exact_sol(y0, xlow, xhigh, k, c, h)
     x = [xlow + i*h for i in range(len(y))]
-    plt.plot(x, y)
-    plt.show()
+    plot(x, y)
+    show()
 
 def plot_both_sol(y0, xlow, xhigh, k, c, h):
     """
@@ -76,12 +98,13 @@ def plot_both_sol(y0, xlow, xhigh, k, c, h):
     y1 = ranged_finit_diff(y0, xlow, xhigh, k, c, h)
     y2 = ranged_exact_sol(y0, xlow, xhigh, k, c, h)
     x = [xlow + i*h for i in range(len(y1))]
-    plt.plot(x, y1, label='finit diff')
-    plt.plot(x, y2, label='exact sol')
+    plot(x, y1, label='finit diff')
+    plot(x, y2, label='exact sol')
     plt.legend()
-    plt.show()
+    show()
 
-#假設y(0)=10, c=0.1, h=0.1, xlow=0, xhigh=10
-#plot_finit_diff(10, 0, 10, 0.1, 0.1, 0.0001) #繪製有限差分的結果
-#plot_exact_sol(10, 0, 10, 0.1, 0.1, 0.0001) #繪製精確解的結果
-plot_both_sol(1, 0, 50, 0.1, 0.01, 0.1) #繪製兩種解的結果
\ No newline at end of file
+if __name__ == '__main__':
+    #假設y(0)=10, c=0.1, h=0.1, xlow=0, xhigh=10
+    #plot_finit_diff(10, 0, 10, 0.1, 0.1, 0.0001) #繪製有限差分的結果
+    #plot_exact_sol(10, 0, 10, 0.1, 0.1, 0.0001) #繪製精確解的結果
+    plot_both_sol(1, 0, 50, 0.1, 0.01, 0.1) #繪製兩種解的結果
\ No newline at end of file
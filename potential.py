@@ -7,7 +7,8 @@ Author: Chang Kai-Po @ Jian Lab 2023/03/16
 """
 
 import numpy as np
-from scipy.sparse import csr_matrix 
+from scipy.sparse import diags
+from fd_operator import laplacian
 from scipy.sparse.linalg import spsolve
 import matplotlib.pyplot as plt
 
@@ -22,12 +23,6 @@ def coefficient_well (N, h, V):
     [0, -1, 2+Vh^2, -1, ..., 0]
     [...  ...  ...  ...  ...]
     [0, 0, ..., ..., -1, 2+Vh^2]
+    [-1, 2, -1]的部分為fd_operator.laplacian快取的稀疏矩陣，不經過N×N的稠密矩陣。
     """
-    A = np.zeros((N,N))
-    A[0,0], A[0,1] = 2+V*h**2, -1
-    A[N-1,N-1], A[N-1,N-2] = 2+V*h**2, -1
-    for i in range(1,N-1):
-        A[i,i-1] = -1
-        A[i,i] = 2+V*h**2
-        A[i,i+1] = -1
-    return csr_matrix(A)
\ No newline at end of file
+    return laplacian(N) + diags(np.broadcast_to(V*h**2, (N,)), format='csr')
\ No newline at end of file
@@ -9,13 +9,16 @@
 """
 
 import numpy as np
-from scipy.sparse import csr_matrix
-from scipy.sparse.linalg import eigs
 from matplotlib import pyplot as plt
 from scipy.constants import electron_mass, hbar
-import pyarma as pa 
+from schrodinger import hamiltonian_tridiagonal, eigen_tridiagonal, eigen_shift_invert, square_well
+from eigen_backend import backend_name
+from eigen_cache import EigenCache
+from instrument import instrument
+from plotting import plot, show
 
-def coeff_matrix(N):
+@instrument
+def coeff_matrix(N, k=10, cache=None):
     """
     有限差分法的係數矩陣。
     方程式為-(hbar^2 / 2m) d^2(psi(x) / dx^2) = E psi(x), 0 < x < L
@@ -29,28 +32,17 @@ def coeff_matrix(N):
         [0 0 ... ... -1 2]
     因此為一特徵值問題，將其轉換為求解A的特徵值和特徵向量。
     其中特徵值為E*2*epsilon^2*m/hbar^2，特徵向量為psi(x)。
+    A為對稱三對角矩陣，只求最小的k個特徵值(見schrodinger.eigen_tridiagonal)，
+    特徵向量為每一行。
+    若給定cache(eigen_cache.EigenCache)，相同的N、k與後端只求解一次。
     """
-    A = np.zeros((N, N))
-    A[0, 0] = 2
-    A[N-1, N-1] = 2
-    A[0, 1] = -1
-    A[N-1, N-2] = -1
-    for i in range(1, N-1):
-        A[i, i-1] = -1
-        A[i, i] = 2
-        A[i, i+1] = -1
-    A = csr_matrix(A)    
-    eigenvalues, eigenvectors =  eigs(A, k=N-2, which='SM')
-    sorted_indices = np.argsort(eigenvalues)    
-    sorted_eigenvalues = eigenvalues[sorted_indices]    
-    sorted_eigenvectors = eigenvectors[:, sorted_indices]
-    # Get the absolute values of the eigenvectors
-    sorted_eigenvectors = np.abs(sorted_eigenvectors)
-    # Get the absolute values of the eigenvalues
-    sorted_eigenvalues = np.abs(sorted_eigenvalues)
-    return sorted_eigenvalues, sorted_eigenvectors     
+    solve = lambda: eigen_tridiagonal(*hamiltonian_tridiagonal(N), k=k)
+    if cache is None:
+        return solve()
+    return cache.solve(solve, N=N, k=k, stencil='fd2', backend=backend_name())
 
-def coeff_matrix_out(N, boundary=10, V0=0.5):
+@instrument
+def coeff_matrix_out(N, boundary=10, V0=0.5, k=10, sigma=None, cache=None):
     """
     有限差分法的係數矩陣。
     方程式為
@@ -67,46 +59,42 @@ def coeff_matrix_out(N, boundary=10, V0=0.5):
     當x在方塊內時V(x) = 0，當x在方塊外時V(x) = V0
     因此為一特徵值問題，將其轉換為求解A的特徵值和特徵向量。
     其中特徵值為E*2*epsilon^2*m/hbar^2，特徵向量為psi(x)。
+    主對角線一次以陣列運算建立(見schrodinger.square_well)，只求最小的k個特徵值。
+    V0 > 0代表方塊外的位能較高，與potential_well_out_of_box.py相同。
+    若給定sigma，則改求最接近sigma的k個特徵值(見schrodinger.eigen_shift_invert)，
+    例如sigma = V0可以找出井口附近的態。
+    若給定cache(eigen_cache.EigenCache)，相同的參數只求解一次。
     """    
-    A = np.zeros((N, N))
-    A[0, 0] = 2-V0
-    A[N-1, N-1] = 2-V0
-    A[0, 1] = -1
-    A[N-1, N-2] = -1
-    for i in range(1, N-1):
-        A[i, i-1] = -1
-        if abs(i-N/2) < (N/(4*boundary+2)): #在方塊內
-            A[i, i] = 2
-        else:                      #在方塊外
-            A[i, i] = 2-V0
-        A[i, i+1] = -1
-    A = csr_matrix(A)    
-    eigenvalues, eigenvectors =  eigs(A, k=N-2, which='SM')
-    sorted_indices = np.argsort(eigenvalues)    
-    sorted_eigenvalues = eigenvalues[sorted_indices]    
-    sorted_eigenvectors = eigenvectors[:, sorted_indices]
-    # Get the absolute values of the eigenvectors
-    sorted_eigenvectors = np.abs(sorted_eigenvectors)
-    # Get the absolute values of the eigenvalues
-    sorted_eigenvalues = np.abs(sorted_eigenvalues)
-    return sorted_eigenvalues, sorted_eigenvectors   
+    V = square_well(2*N/(4*boundary+2), V0)(np.arange(N)-N/2)
+    if sigma is not None:
+        solve = lambda: eigen_shift_invert(*hamiltonian_tridiagonal(N, V), sigma, k=k)
+    else:
+        solve = lambda: eigen_tridiagonal(*hamiltonian_tridiagonal(N, V), k=k)
+    if cache is None:
+        return solve()
+    return cache.solve(solve, N=N, boundary=boundary, V0=V0, k=k, sigma=sigma,
+                       stencil='fd2', backend=backend_name())
 
-eigenvalues = coeff_matrix_out(1000, boundary=5, V0=0.1)
-eigenvalues_another = coeff_matrix(500)
-epsilon = 0.002
-print("First ten eigenvalues:", [f"{np.real(e):.7f}" for e in eigenvalues[0][:10]])
-print(eigenvalues[1][:10])
+if __name__ == '__main__':
+    # 結果存在.eigen_cache，第二次執行時直接從硬碟載入
+    cache = EigenCache('.eigen_cache')
+    eigenvalues = coeff_matrix_out(1000, boundary=5, V0=0.1, cache=cache)
+    eigenvalues_another = coeff_matrix(500, cache=cache)
+    print("快取命中%d次，未命中%d次" % (cache.hits, cache.misses))
+    epsilon = 0.002
+    print("First ten eigenvalues:", [f"{e:.7f}" for e in eigenvalues[0][:10]])
+    print(eigenvalues[1][:10])
 
-fig, axs = plt.subplots(3, 1, figsize=(6, 8), sharex=True)
-for i in range(3):
-    # Energy = eigenvalue *0.5* hbar^2 / epsilon^2 / m
-    energy = eigenvalues[0][i] * 0.5 * hbar**2 / epsilon**2 / electron_mass
-    axs[i].plot(eigenvalues[1][i], label=f"n={i+1} E={np.real(energy)}")
-    axs[i].set_ylabel(r"$\psi(x)$")
-    axs[i].legend(loc='upper right')
-    #plot the second graph
-    energy = eigenvalues_another[0][i] * 0.5 * hbar**2 / epsilon**2 / electron_mass
-    axs[i].plot(eigenvalues_another[1][i], label=f"n={i+1} E={np.real(energy)}")
-    axs[i].legend(loc='upper right')
-axs[2].set_xlabel(r"$x$")
-plt.show()
\ No newline at end of file
+    fig, axs = plt.subplots(3, 1, figsize=(6, 8), sharex=True)
+    for i in range(3):
+        # Energy = eigenvalue *0.5* hbar^2 / epsilon^2 / m
+        energy = eigenvalues[0][i] * 0.5 * hbar**2 / epsilon**2 / electron_mass
+        plot(eigenvalues[1][:, i], ax=axs[i], label=f"n={i+1} E={energy}")
+        axs[i].set_ylabel(r"$\psi(x)$")
+        axs[i].legend(loc='upper right')
+        #plot the second graph
+        energy = eigenvalues_another[0][i] * 0.5 * hbar**2 / epsilon**2 / electron_mass
+        plot(eigenvalues_another[1][:, i], ax=axs[i], label=f"n={i+1} E={energy}")
+        axs[i].legend(loc='upper right')
+    axs[2].set_xlabel(r"$x$")
+    show()
\ No newline at end of file
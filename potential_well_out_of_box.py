@@ -11,8 +11,12 @@
 import numpy as np
 from matplotlib import pyplot as plt
 from scipy.constants import electron_mass, hbar
+from schrodinger import hamiltonian_tridiagonal, eigen_tridiagonal, square_well
+from instrument import instrument
+from plotting import plot, show
 
-def coeff_matrix_out(N, boundary=10, V0=0.5):
+@instrument
+def coeff_matrix_out(N, boundary=10, V0=0.5, k=10):
     """
     有限差分法的係數矩陣。
     方程式為
@@ -29,40 +33,25 @@ def coeff_matrix_out(N, boundary=10, V0=0.5):
     當x在井內時V(x) = 0，當x在井外時V(x) = V0
     因此為一特徵值問題，將其轉換為求解A的特徵值和特徵向量。
     其中特徵值為E*2*epsilon^2*m/hbar^2，特徵向量為psi(x)。
+    A為對稱三對角矩陣，主對角線一次以陣列運算建立(見schrodinger.square_well)，
+    只求最小的k個特徵值(見schrodinger.eigen_tridiagonal)。
+    若要以物理單位指定任意位能，請用schrodinger.solve_schrodinger。
     """    
-    A = np.zeros((N, N))
-    A[0, 0] = 2+V0
-    A[N-1, N-1] = 2+V0
-    A[0, 1] = -1
-    A[N-1, N-2] = -1
-    for i in range(1, N-1):
-        A[i, i-1] = -1
-        if abs(i-N/2) < (N/(4*boundary+2)): #在井內
-            A[i, i] = 2
-        else:                      #在井外
-            A[i, i] = 2+V0
-        A[i, i+1] = -1    
-    eigenvalues, eigenvectors = np.linalg.eig(A)
-    sorted_indices = np.argsort(eigenvalues)    
-    sorted_eigenvalues = eigenvalues[sorted_indices]    
-    sorted_eigenvectors = eigenvectors[:, sorted_indices]
-    # Get the absolute values of the eigenvectors
-    sorted_eigenvectors = np.abs(sorted_eigenvectors)
-    # Get the absolute values of the eigenvalues
-    sorted_eigenvalues = np.abs(sorted_eigenvalues)
-    return sorted_eigenvalues, sorted_eigenvectors   
+    V = square_well(2*N/(4*boundary+2), V0)(np.arange(N)-N/2)
+    return eigen_tridiagonal(*hamiltonian_tridiagonal(N, V), k=k)
 
-eigenvalues = coeff_matrix_out(200, boundary=10, V0=1)
-epsilon = 0.002
-print("First ten eigenvalues:", [f"{np.real(e):.7f}" for e in eigenvalues[0][:10]])
-print(eigenvalues[1][:10])
+if __name__ == '__main__':
+    eigenvalues = coeff_matrix_out(200, boundary=10, V0=1)
+    epsilon = 0.002
+    print("First ten eigenvalues:", [f"{e:.7f}" for e in eigenvalues[0][:10]])
+    print(eigenvalues[1][:10])
 
-fig, axs = plt.subplots(3, 1, figsize=(6, 8), sharex=True)
-for i in range(3):
-    # Energy = eigenvalue *0.5* hbar^2 / epsilon^2 / m
-    energy = eigenvalues[0][i] * 0.5 * hbar**2 / epsilon**2 / electron_mass
-    axs[i].plot(eigenvalues[1][i], label=f"n={i+1} E={np.real(energy)}")
-    axs[i].set_ylabel(r"$\psi(x)$")
-    axs[i].legend(loc='upper right')    
-axs[2].set_xlabel(r"$x$")
-plt.show()
\ No newline at end of file
+    fig, axs = plt.subplots(3, 1, figsize=(6, 8), sharex=True)
+    for i in range(3):
+        # Energy = eigenvalue *0.5* hbar^2 / epsilon^2 / m
+        energy = eigenvalues[0][i] * 0.5 * hbar**2 / epsilon**2 / electron_mass
+        plot(eigenvalues[1][:, i], ax=axs[i], label=f"n={i+1} E={energy}")
+        axs[i].set_ylabel(r"$\psi(x)$")
+        axs[i].legend(loc='upper right')    
+    axs[2].set_xlabel(r"$x$")
+    show()
\ No newline at end of file
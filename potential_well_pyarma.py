@@ -8,14 +8,15 @@
     Created by Chang Kai-Po @ Jian Lab, 2023/03/18
 """
 
-import numpy as np
-from scipy.sparse import csr_matrix
-from scipy.sparse.linalg import eigs
 from matplotlib import pyplot as plt
 from scipy.constants import electron_mass, hbar
-import pyarma as pa 
+from eigen_backend import eigen_lowest
+from instrument import instrument
+from fd_operator import laplacian
+from plotting import plot, show
 
-def coeff_matrix(N):
+@instrument
+def coeff_matrix(N, k=10, backend='pyarma'):
     """
     有限差分法的係數矩陣。
     方程式為-(hbar^2 / 2m) d^2(psi(x) / dx^2) = E psi(x), 0 < x < L
@@ -29,33 +30,24 @@ def coeff_matrix(N):
         [0 0 ... ... -1 2]
     因此為一特徵值問題，將其轉換為求解A的特徵值和特徵向量。
     其中特徵值為E*2*epsilon^2*m/hbar^2，特徵向量為psi(x)。
+    A為實對稱矩陣，以pyarma的eig_sym求解(見eigen_backend.load_pyarma)，
+    特徵值為實數且由小到大排列，只傳回最小的k個，特徵向量為每一行。
+    backend可改為'numpy'或'scipy'比較結果。
     """
-    A = np.zeros((N, N))
-    A[0, 0] = 2
-    A[N-1, N-1] = 2
-    A[0, 1] = -1
-    A[N-1, N-2] = -1
-    for i in range(1, N-1):
-        A[i, i-1] = -1
-        A[i, i] = 2
-        A[i, i+1] = -1 
-    eigenvalues, eigenvectors =  pa.eig_gen(A, k=N-2, which='SM')
-    sorted_indices = np.argsort(eigenvalues)    
-    sorted_eigenvalues = eigenvalues[sorted_indices]
-    sorted_eigenvectors = eigenvectors[:, sorted_indices]
-    return sorted_eigenvalues, sorted_eigenvectors     
+    A = laplacian(N)
+    return eigen_lowest(A, k, backend=backend)
 
+if __name__ == '__main__':
+    eigenvalues = coeff_matrix(500)
+    epsilon = 0.002
+    print("First ten eigenvalues:", [f"{e:.7f}" for e in eigenvalues[0][:10]])
 
-eigenvalues = coeff_matrix(500)
-epsilon = 0.002
-print("First ten eigenvalues:", [f"{np.real(e):.7f}" for e in eigenvalues[0][:10]])
-
-fig, axs = plt.subplots(3, 1, figsize=(6, 8), sharex=True)
-for i in range(3):
-    # Energy = eigenvalue *0.5* hbar^2 / epsilon^2 / m
-    energy = eigenvalues[0][i] * 0.5 * hbar**2 / epsilon**2 / electron_mass
-    axs[i].plot(eigenvalues[1][i], label=f"n={i+1} E={np.real(energy)}")
-    axs[i].set_ylabel(r"$\psi(x)$")
-    axs[i].legend(loc='upper right')
-axs[2].set_xlabel(r"$x$")
-plt.show()
\ No newline at end of file
+    fig, axs = plt.subplots(3, 1, figsize=(6, 8), sharex=True)
+    for i in range(3):
+        # Energy = eigenvalue *0.5* hbar^2 / epsilon^2 / m
+        energy = eigenvalues[0][i] * 0.5 * hbar**2 / epsilon**2 / electron_mass
+        plot(eigenvalues[1][:, i], ax=axs[i], label=f"n={i+1} E={energy}")
+        axs[i].set_ylabel(r"$\psi(x)$")
+        axs[i].legend(loc='upper right')
+    axs[2].set_xlabel(r"$x$")
+    show()
@@ -0,0 +1,265 @@
+"""
+schrodinger.py
+~~~~~~~~~~~~~~
+一維薛丁格方程式的特徵值引擎。
+有限差分後的Hamiltonian為對稱三對角矩陣，只以主對角線d與次對角線e兩個向量表示，
+再以eigh_tridiagonal只求需要的特徵值(依序號或能量範圍選取)，
+不需要建立N×N的矩陣，求最低的k個態的計算量約為O(N*k)。
+solve_schrodinger則接受任意位能函數或陣列，直接以物理單位(公尺、焦耳)求解。
+只需要某個能量附近的幾個態時，eigen_shift_invert以shift-invert Lanczos求解。
+除了三點差分之外，eigen_hamiltonian也提供五點、七點差分、Numerov法與sine-DVR，
+box_convergence則與盒中粒子的精確能量n^2*pi^2/(2L^2)比較收斂速度。
+eigen_tridiagonal求最小的k個態時，可以經由eigen_backend改用numpy或pyarma求解。
+"""
+
+from collections import OrderedDict
+import numpy as np
+from scipy.linalg import eigh_tridiagonal, eig_banded, eigh, solve_banded
+from scipy.sparse import diags
+from scipy.sparse.linalg import splu, eigsh, LinearOperator
+from scipy.constants import electron_mass, hbar
+from eigen_backend import backend_name, eigen_lowest
+from eigen_cache import cache_key
+from fd_operator import laplacian
+
+def hamiltonian_tridiagonal(N, V=0.0):
+    """
+    有限差分法的Hamiltonian，方程式-psi'' + V*psi = E*psi乘上h^2後為
+    [-1, 2+V, -1]的對稱三對角矩陣，其中V為乘上h^2之後的位能，
+    可為純量或長度N的陣列。
+    傳回主對角線d(長度N)與次對角線e(長度N-1)。
+    """
+    d = 2.0 + np.broadcast_to(np.asarray(V, dtype=float), (N,))
+    e = np.full(N-1, -1.0)
+    return d, e
+
+def fix_sign(vectors):
+    """
+    特徵向量的正負號是任意的，這裡統一讓每一個特徵向量
+    第一個明顯不為零的元素為正，每次計算的結果才會一致。
+    """
+    significant = np.abs(vectors) > 1e-8*np.max(np.abs(vectors), axis=0)
+    first = np.argmax(significant, axis=0)
+    signs = np.sign(vectors[first, np.arange(vectors.shape[1])])
+    return vectors*signs
+
+def eigen_tridiagonal(d, e, k=10, window=None, backend=None):
+    """
+    求對稱三對角矩陣(主對角線d，次對角線e)的特徵值與特徵向量。
+    預設求最小的k個特徵值；若給定window=(Emin, Emax)，
+    則改為求所有落在(Emin, Emax]之間的特徵值，此時k不使用。
+    backend(或環境變數NP_EIGEN_BACKEND)不是'scipy'時，
+    最小的k個特徵值改由該後端求解(見eigen_backend)。
+    傳回由小到大排列的實數特徵值，以及對應的特徵向量(每一行為一個向量)，
+    特徵向量已正交歸一化，正負號見fix_sign。
+    """
+    if window is None and backend_name(backend) != 'scipy':
+        return eigen_lowest(diags([e, d, e], [-1, 0, 1], format='csr'), k, backend)
+    if window is None:
+        k = min(k, len(d))
+        eigenvalues, eigenvectors = eigh_tridiagonal(d, e, select='i',
+                                                     select_range=(0, k-1))
+    else:
+        eigenvalues, eigenvectors = eigh_tridiagonal(d, e, select='v',
+                                                     select_range=window)
+    return eigenvalues, fix_sign(eigenvectors)
+
+FACTORS = OrderedDict() # shift_invert_factor的LRU快取
+MAX_FACTORS = 16
+
+def shift_invert_factor(d, e, sigma):
+    """
+    對H - sigma*I做稀疏LU分解並快取，H以主對角線d與次對角線e表示。
+    key為(d, e, sigma)的SHA-1(eigen_cache.cache_key)，不保留陣列本身，
+    最多保留MAX_FACTORS個分解。三對角矩陣以原本的順序分解不會有fill-in。
+    """
+    key = cache_key(d=d, e=e, sigma=sigma)
+    if key in FACTORS:
+        FACTORS.move_to_end(key)
+        return FACTORS[key]
+    A = diags([e, d - sigma, e], [-1, 0, 1], format='csc')
+    FACTORS[key] = lu = splu(A, permc_spec='NATURAL')
+    while len(FACTORS) > MAX_FACTORS:
+        FACTORS.popitem(last=False)
+    return lu
+
+def eigen_shift_invert(d, e, sigma, k=6):
+    """
+    求對稱三對角矩陣(主對角線d，次對角線e)最接近sigma的k個特徵值與特徵向量。
+    以shift-invert Lanczos(eigsh)對(H - sigma*I)^-1求最大的特徵值，
+    H - sigma*I只分解一次(見shift_invert_factor)，同一個sigma再次求解時直接使用快取。
+    傳回值的格式與eigen_tridiagonal相同。
+    """
+    d = np.ascontiguousarray(d, dtype=float)
+    e = np.ascontiguousarray(e, dtype=float)
+    N = len(d)
+    lu = shift_invert_factor(d, e, float(sigma))
+    H = diags([e, d, e], [-1, 0, 1], format='csr')
+    OPinv = LinearOperator((N, N), matvec=lu.solve, dtype=float)
+    eigenvalues, eigenvectors = eigsh(H, k=min(k, N-1), sigma=sigma, which='LM', OPinv=OPinv)
+    order = np.argsort(eigenvalues)
+    return eigenvalues[order], fix_sign(eigenvectors[:, order])
+
+# 差分方式對應的精度(係數見fd_operator.stencil)
+STENCILS = {'fd2': 2, 'fd4': 4, 'fd6': 6}
+
+def hamiltonian_banded(N, V=0.0, method='fd4'):
+    """
+    高階差分的Hamiltonian(乘上h^2)，以eig_banded所需的上帶狀格式儲存：
+    ab[p-m, j] = A[j-m, j]，p為帶寬。
+    差分點超出邊界時，以psi(-x) = -psi(x)的奇鏡像代回內部點(fd_operator的dirichlet)，
+    矩陣仍為對稱，且對盒中粒子的正弦波函數保持高階精度。
+    """
+    ab = laplacian(N, order=STENCILS[method], form='banded')
+    p = len(ab)//2
+    ab = ab[:p+1].copy()
+    ab[p] += np.broadcast_to(np.asarray(V, dtype=float), (N,))
+    return ab
+
+def numerov_hamiltonian(N, V=0.0):
+    """
+    Numerov法：psi'' = (V-E)psi 的離散式為
+    (psi[i+1] - 2psi[i] + psi[i-1]) = (psi''[i+1] + 10psi''[i] + psi''[i-1])/12 (乘上h^2)，
+    整理成廣義特徵值問題 (K + B*V) psi = E B psi，其中K = [-1, 2, -1]，B = [1, 10, 1]/12。
+    K與B都是[1, 0, 1]位移矩陣的多項式，彼此交換，因此B^-1 K為對稱矩陣，
+    上式等價於一般的對稱特徵值問題 (B^-1 K + V) psi = E psi。
+    B^-1 K以三對角的solve_banded計算(O(N^2))，傳回稠密的對稱矩陣。
+    """
+    V = np.broadcast_to(np.asarray(V, dtype=float), (N,))
+    B = np.array([np.full(N, 1.0), np.full(N, 10.0), np.full(N, 1.0)])/12
+    H = solve_banded((1, 1), B, laplacian(N).toarray())
+    H = (H + H.T)/2 # 消去捨入誤差造成的不對稱
+    H[np.diag_indices(N)] += V
+    return H
+
+def sine_dvr(N, V=0.0):
+    """
+    sine-DVR(Colbert-Miller)的Hamiltonian(乘上h^2)，基底為盒中粒子的正弦函數，
+    位能在格點上為對角。V = 0時前N個能量與盒中粒子的精確解相同。
+    傳回稠密矩陣。
+    """
+    M = N + 1
+    i = np.arange(1, N+1)
+    I, J = np.meshgrid(i, i, indexing='ij')
+    with np.errstate(divide='ignore'):
+        T = (-1.0)**(I-J)*(1/np.sin(np.pi*(I-J)/(2*M))**2 - 1/np.sin(np.pi*(I+J)/(2*M))**2)
+    T[i-1, i-1] = (2*M**2+1)/3 - 1/np.sin(np.pi*i/M)**2
+    # 原式的前置係數為pi^2/(2L^2)*hbar^2/2m，L = M*h
+    return np.pi**2/(2*M**2)*T + np.diag(np.broadcast_to(np.asarray(V, dtype=float), (N,)))
+
+def eigen_hamiltonian(N, V=0.0, k=10, method='fd2', window=None):
+    """
+    以指定的離散方式求Hamiltonian(乘上h^2，V亦為乘上h^2之後的位能)最小的k個態：
+    'fd2'為三點差分(三對角，見eigen_tridiagonal)，誤差為O(h^2)；
+    'fd4'、'fd6'為五點、七點差分(帶狀，eig_banded)，誤差為O(h^4)、O(h^6)；
+    'numerov'為Numerov法(稠密的對稱矩陣，見numerov_hamiltonian)，誤差為O(h^4)；
+    'dvr'為sine-DVR(稠密)，誤差隨N指數下降。
+    window只適用於'fd2'、'fd4'、'fd6'，其他方式給定window時會產生ValueError。
+    傳回值的格式與eigen_tridiagonal相同。
+    """
+    k = min(k, N)
+    if window is not None and method in ('numerov', 'dvr'):
+        raise ValueError("%s不支援window，只能求最低的k個態" % method)
+    if method == 'fd2':
+        return eigen_tridiagonal(*hamiltonian_tridiagonal(N, V), k=k, window=window)
+    if method in STENCILS:
+        ab = hamiltonian_banded(N, V, method)
+        if window is None:
+            eigenvalues, eigenvectors = eig_banded(ab, select='i', select_range=(0, k-1))
+        else:
+            eigenvalues, eigenvectors = eig_banded(ab, select='v', select_range=window)
+    elif method == 'numerov':
+        eigenvalues, eigenvectors = eigh(numerov_hamiltonian(N, V), subset_by_index=(0, k-1))
+    elif method == 'dvr':
+        eigenvalues, eigenvectors = eigh(sine_dvr(N, V), subset_by_index=(0, k-1))
+    else:
+        raise ValueError("未知的離散方式: %s" % method)
+    return eigenvalues, fix_sign(eigenvectors)
+
+def box_convergence(method, Ns, levels=5, L=1.0):
+    """
+    盒中粒子(hbar = m = 1，盒長L)的收斂測試：對每一個N求最低的levels個能量，
+    與精確解n^2*pi^2/(2L^2)比較。傳回形狀為(len(Ns), levels)的相對誤差。
+    """
+    n = np.arange(1, levels+1)
+    exact = n**2*np.pi**2/(2*L**2)
+    errors = []
+    for N in Ns:
+        h = L/(N+1)
+        eigenvalues, _ = eigen_hamiltonian(N, k=levels, method=method)
+        errors.append(np.abs(eigenvalues/(2*h**2) - exact)/exact)
+    return np.array(errors)
+
+def square_well(width, V0, center=0.0):
+    """
+    有限深方形位能井：|x-center| < width/2時V = 0，其餘為V0(V0 > 0)。
+    傳回可向量化的函數V(x)。
+    """
+    return lambda x: np.where(np.abs(x-center) < width/2, 0.0, V0)
+
+def harmonic(omega, mass=electron_mass, center=0.0):
+    """
+    諧振子位能 V = m*omega^2*(x-center)^2/2。
+    """
+    return lambda x: 0.5*mass*omega**2*(x-center)**2
+
+def double_well(a, V0):
+    """
+    雙井位能 V = V0*((x/a)^2 - 1)^2，兩個井底在x = ±a，中間的位障高度為V0。
+    """
+    return lambda x: V0*((x/a)**2 - 1)**2
+
+def kronig_penney(period, width, V0, offset=0.0):
+    """
+    Kronig-Penney週期位障：每一個週期period內，寬度為width的位障高度為V0。
+    """
+    return lambda x: np.where(np.mod(x-offset, period) < width, V0, 0.0)
+
+def tabulated(x_data, V_data):
+    """
+    以表格資料(x_data, V_data)線性內插的位能。
+    """
+    return lambda x: np.interp(x, x_data, V_data)
+
+def solve_schrodinger(x, V, k=10, window=None, sigma=None, method='fd2',
+                      mass=electron_mass, hbar=hbar):
+    """
+    求解一維薛丁格方程式 -(hbar^2/2m) psi'' + V(x) psi = E psi。
+    x為等距的內部格點(兩端x[0]-h與x[-1]+h處psi = 0)，單位為公尺；
+    V為可向量化的函數V(x)或長度與x相同的陣列，單位為焦耳。
+    Hamiltonian的主對角線以一次陣列運算建立，
+    再乘上hbar^2/(2m h^2)換算成物理單位。
+    k與window見eigen_tridiagonal，window的單位為焦耳。
+    若給定sigma(焦耳)，則改以eigen_shift_invert求最接近sigma的k個態。
+    method為離散方式(見eigen_hamiltonian)，sigma只適用於'fd2'，
+    其他的method給定sigma時會產生ValueError。
+    傳回能量(焦耳)以及在格點上歸一化(sum |psi|^2 h = 1)的波函數(每一行為一個態)。
+    """
+    x = np.asarray(x, dtype=float)
+    h = x[1] - x[0]
+    scale = 0.5*hbar**2/(mass*h**2) # 由無因次特徵值換算成能量
+    potential = V(x) if callable(V) else np.asarray(V, dtype=float)
+    if sigma is not None:
+        if method != 'fd2':
+            raise ValueError("sigma(shift-invert)只適用於method='fd2'，不能用於%s" % method)
+        d, e = hamiltonian_tridiagonal(len(x), potential/scale)
+        eigenvalues, eigenvectors = eigen_shift_invert(d, e, sigma/scale, k=k)
+        return eigenvalues*scale, eigenvectors/np.sqrt(h)
+    if window is not None:
+        window = (window[0]/scale, window[1]/scale)
+    eigenvalues, eigenvectors = eigen_hamiltonian(len(x), potential/scale, k=k,
+                                                  method=method, window=window)
+    return eigenvalues*scale, eigenvectors/np.sqrt(h)
+
+if __name__ == '__main__':
+    from matplotlib import pyplot as plt
+    # 盒中粒子最低5個能量的相對誤差，與N的關係
+    Ns = [25, 50, 100, 200, 400]
+    for method in ('fd2', 'fd4', 'fd6', 'numerov', 'dvr'):
+        errors = box_convergence(method, Ns)
+        print(method, ["%.1e" % e for e in errors.max(axis=1)])
+        plt.loglog(Ns, errors.max(axis=1), marker='o', label=method)
+    plt.xlabel("N")
+    plt.ylabel("max relative error")
+    plt.legend()
+    plt.show()
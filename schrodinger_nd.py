@@ -0,0 +1,151 @@
+"""
+schrodinger_nd.py
+~~~~~~~~~~~~~~~~~
+二維、三維的薛丁格方程式(量子井、量子點)的特徵值求解。
+Hamiltonian為一維動能矩陣的Kronecker和加上對角的位能，以稀疏矩陣儲存，
+再以LOBPCG或shift-invert Lanczos只求最低的k個態；
+matrix_free時改為只以陣列切片計算H psi的LinearOperator，不儲存矩陣。
+LOBPCG的預條件子為(動能 + 常數)的反矩陣，
+Dirichlet邊界的[-1, 2, -1]可被DST-I對角化，因此每次只需O(N log N)。
+若位能可分離(V = Vx(x) + Vy(y) + ...)，則直接組合一維的能譜，完全不需要對角化。
+"""
+
+import itertools
+import numpy as np
+from scipy.sparse import diags
+from scipy.sparse.linalg import eigsh, lobpcg
+from scipy.constants import electron_mass, hbar
+from matplotlib import pyplot as plt
+from schrodinger import solve_schrodinger
+from fd_operator import laplacian_nd, operator_nd, spectral_preconditioner
+
+def kinetic_scales(axes, mass=electron_mass, hbar=hbar):
+    """
+    每一個方向的動能係數hbar^2/(2m h^2)，axes為每一個方向的等距內部格點。
+    """
+    return [0.5*hbar**2/(mass*(x[1]-x[0])**2) for x in axes]
+
+def hamiltonian_nd(axes, V, mass=electron_mass, hbar=hbar):
+    """
+    建立多維Hamiltonian的稀疏矩陣(CSR)：
+    H = sum_a I⊗...⊗T_a⊗...⊗I + diag(V)，T_a = hbar^2/(2m h_a^2)*[-1, 2, -1]。
+    V為格點上的位能陣列(形狀與格點相同)，單位為焦耳。
+    動能部分為fd_operator.laplacian_nd快取的矩陣。
+    """
+    shape = tuple(len(x) for x in axes)
+    h = [x[1]-x[0] for x in axes]
+    return 0.5*hbar**2/mass*laplacian_nd(shape, h) + diags(np.ravel(V), format='csr')
+
+def hamiltonian_operator_nd(axes, V, mass=electron_mass, hbar=hbar):
+    """
+    與hamiltonian_nd相同的Hamiltonian，但為matrix-free的LinearOperator
+    (fd_operator.operator_nd)，不儲存任何矩陣元素，只需要位能陣列與幾個向量的記憶體。
+    """
+    shape = tuple(len(x) for x in axes)
+    h = [x[1]-x[0] for x in axes]
+    return operator_nd(shape, h, scale=0.5*hbar**2/mass,
+                       potential=np.broadcast_to(np.asarray(V, dtype=float), shape))
+
+def kinetic_preconditioner(axes, shift, mass=electron_mass, hbar=hbar):
+    """
+    LOBPCG的預條件子(T + shift)^-1，T為多維動能。
+    DST-I的基底即為[-1, 2, -1]的特徵向量，不需要任何分解
+    (見fd_operator.spectral_preconditioner)。
+    """
+    return spectral_preconditioner(tuple(len(x) for x in axes), [x[1]-x[0] for x in axes],
+                                   shift, 0.5*hbar**2/mass)
+
+def separable_states(axes, potentials, k=6, mass=electron_mass, hbar=hbar):
+    """
+    可分離位能V = sum_a V_a(x_a)的快速解法：每一個方向各求k個一維的態，
+    多維的能量為一維能量的和，波函數為一維波函數的乘積，不需要對角化多維矩陣。
+    傳回最低的k個能量與歸一化的波函數(每一行為一個態)。
+    """
+    spectra = [solve_schrodinger(x, V, k=k, mass=mass, hbar=hbar)
+               for x, V in zip(axes, potentials)]
+    combos = sorted(itertools.product(*[range(len(E)) for E, _ in spectra]),
+                    key=lambda c: sum(spectra[a][0][i] for a, i in enumerate(c)))[:k]
+    energies = np.array([sum(spectra[a][0][i] for a, i in enumerate(c)) for c in combos])
+    states = []
+    for c in combos:
+        psi = spectra[0][1][:, c[0]]
+        for a in range(1, len(axes)):
+            psi = np.multiply.outer(psi, spectra[a][1][:, c[a]])
+        states.append(psi.ravel())
+    return energies, np.array(states).T
+
+def solve_schrodinger_nd(axes, V, k=6, method='lobpcg', mass=electron_mass, hbar=hbar,
+                         tol=1e-6, maxiter=500, seed=0, matrix_free=False):
+    """
+    求解多維薛丁格方程式最低的k個態。
+    axes為每一個方向的等距內部格點(公尺)，邊界上psi = 0。
+    V可為格點上的位能陣列、可向量化的函數V(X, Y, ...)(以indexing='ij'的網格呼叫)，
+    或是method='separable'時每一個方向的一維位能(見separable_states)。
+    method：'lobpcg'使用LOBPCG與kinetic_preconditioner；
+    'shift-invert'在最低位能處做shift-invert Lanczos(eigsh，需要稀疏LU分解)；
+    'lanczos'以eigsh直接求最小的代數特徵值(不需要分解，但迭代次數較多，
+    單一向量的Lanczos可能漏掉簡併的態)；
+    'separable'組合一維能譜。
+    matrix_free為True時Hamiltonian為hamiltonian_operator_nd(不建立矩陣)，
+    適用於'lobpcg'與'lanczos'，三維的大網格也只需要幾個向量的記憶體。
+    傳回能量(焦耳)以及歸一化(sum |psi|^2 dV = 1)的波函數，
+    每一行為一個態，reshape成格點的形狀即為波函數。
+    """
+    if method == 'separable':
+        return separable_states(axes, V, k, mass, hbar)
+    shape = tuple(len(x) for x in axes)
+    if callable(V):
+        V = V(*np.meshgrid(*axes, indexing='ij'))
+    V = np.broadcast_to(np.asarray(V, dtype=float), shape)
+    V_min = np.min(V)
+    # 以最大的動能係數為能量單位計算(質量乘上unit即讓動能除以unit)，
+    # 焦耳的數量級太小，收斂條件會失去意義
+    unit = max(kinetic_scales(axes, mass, hbar))
+    V = (V - V_min)/unit # 平移讓H為正定，與預條件子一致
+    if matrix_free:
+        if method == 'shift-invert':
+            raise ValueError("shift-invert需要矩陣的LU分解，不能使用matrix_free")
+        H = hamiltonian_operator_nd(axes, V, mass*unit, hbar)
+    else:
+        H = hamiltonian_nd(axes, V, mass*unit, hbar)
+    dV = np.prod([x[1]-x[0] for x in axes])
+    if method == 'lobpcg':
+        # 初始向量：以通過位能最低點的一維切面做可分離近似，再加上少許亂數
+        center = np.unravel_index(np.argmin(V), shape)
+        slices = [V[center[:a] + (slice(None),) + center[a+1:]]*unit for a in range(len(shape))]
+        X = separable_states(axes, slices, k, mass, hbar)[1]
+        X = X/np.linalg.norm(X, axis=0)
+        X = X + 1e-3*np.random.default_rng(seed).standard_normal(X.shape)/np.sqrt(X.shape[0])
+        M = kinetic_preconditioner(axes, np.mean(V), mass*unit, hbar)
+        energies, states = lobpcg(H, X, M=M, tol=tol, maxiter=maxiter, largest=False)
+    elif method == 'shift-invert':
+        energies, states = eigsh(H, k=k, sigma=0, which='LM')
+    elif method == 'lanczos':
+        energies, states = eigsh(H, k=k, which='SA', tol=tol)
+    else:
+        raise ValueError("未知的求解方式: %s" % method)
+    order = np.argsort(energies)
+    states = states[:, order]/np.linalg.norm(states[:, order], axis=0)
+    return energies[order]*unit + V_min, states/np.sqrt(dV)
+
+if __name__ == '__main__':
+    from scipy.constants import eV, nano
+    # 10nm x 10nm的方形量子點，井深0.3eV，外圍為20nm x 20nm的計算區域
+    x = np.linspace(-10*nano, 10*nano, 256)
+    axes = (x, x)
+    well = lambda X, Y: np.where((np.abs(X) < 5*nano) & (np.abs(Y) < 5*nano), 0.0, 0.3*eV)
+    energies, states = solve_schrodinger_nd(axes, well, k=6)
+    print("LOBPCG的最低6個能量(eV):", np.round(energies/eV, 6))
+
+    # 方形井可分離：V(x, y) = Vx(x) + Vy(y)時，與上面的位能不同(角落為0.6eV)，
+    # 但可直接組合一維能譜
+    line = lambda x: np.where(np.abs(x) < 5*nano, 0.0, 0.3*eV)
+    E_sep, psi_sep = solve_schrodinger_nd(axes, (line, line), k=6, method='separable')
+    print("可分離位能的最低6個能量(eV):", np.round(E_sep/eV, 6))
+
+    fig, axs = plt.subplots(2, 3, figsize=(9, 6))
+    for i, ax in enumerate(axs.ravel()):
+        ax.imshow(states[:, i].reshape(len(x), len(x)).T, origin='lower',
+                  extent=(x[0]/nano, x[-1]/nano, x[0]/nano, x[-1]/nano))
+        ax.set_title("E=%.4f eV" % (energies[i]/eV))
+    plt.show()
@@ -0,0 +1,168 @@
+"""
+schrodinger_propagator.py
+~~~~~~~~~~~~~~~~~~~~~~~~~
+一維含時薛丁格方程式 i*hbar*dpsi/dt = H psi 的波包傳播。
+格點與位能的寫法和schrodinger.solve_schrodinger相同：x為等距的內部格點，
+兩端x[0]-h與x[-1]+h處psi = 0，位能為可向量化的函數或陣列(焦耳)。
+'split'為分裂算符法：動能在DST-I(正弦轉換，以FFT計算)的基底下為對角，
+每一步只需兩次O(N log N)的轉換；'cn'為Crank-Nicolson法，
+(I + iH dt/2hbar)只做一次稀疏LU分解，之後每一步為O(N)。
+兩種方法都是么正的，波函數的範數不隨時間改變。
+快照與可觀測量(範數、<x>、能量)以sink(n, t, psi)輸出，記憶體用量與步數無關。
+"""
+
+import numpy as np
+from scipy.fft import dst
+from scipy.sparse import diags, identity
+from scipy.sparse.linalg import splu
+from scipy.constants import electron_mass, hbar
+from matplotlib import pyplot as plt
+from schrodinger import square_well
+from fd_operator import laplacian
+
+def gaussian_packet(x, x0, sigma, k0):
+    """
+    高斯波包 exp(-(x-x0)^2/(4 sigma^2) + i k0 x)，中心x0、寬度sigma、平均波數k0。
+    傳回在格點上歸一化(sum |psi|^2 h = 1)的複數陣列。
+    """
+    psi = np.exp(-(x-x0)**2/(4*sigma**2) + 1j*k0*x)
+    return psi/np.sqrt(np.sum(np.abs(psi)**2)*(x[1]-x[0]))
+
+def kinetic_spectrum(x, mass=electron_mass, hbar=hbar):
+    """
+    DST-I第j個基底sin(j*pi*(i+1)/(N+1))的動能hbar^2 k_j^2/(2m)，k_j = j*pi/((N+1)h)。
+    使用連續的色散關係(與sine-DVR相同)，而不是三點差分的2-2cos。
+    DST-I內部以長度2(N+1)的FFT計算，N+1取2的次方時最快(N+1有大質因數時會慢很多倍)。
+    """
+    N, h = len(x), x[1]-x[0]
+    k = np.arange(1, N+1)*np.pi/((N+1)*h)
+    return 0.5*hbar**2*k**2/mass
+
+def hamiltonian_sparse(x, V, mass=electron_mass, hbar=hbar):
+    """
+    三點差分的Hamiltonian(CSR，焦耳)，即solve_schrodinger使用的矩陣。
+    """
+    potential = np.broadcast_to(np.asarray(V, dtype=float), (len(x),))
+    return 0.5*hbar**2/mass*laplacian(len(x), x[1]-x[0]) + diags(potential, format='csr')
+
+def hamiltonian_operator(x, V, method='split', mass=electron_mass, hbar=hbar):
+    """
+    傳回計算H psi的函數，與method使用的離散方式一致：
+    'split'的動能在DST-I基底下計算，'cn'為三點差分的三對角矩陣。
+    """
+    potential = V(x) if callable(V) else np.asarray(V, dtype=float)
+    if method == 'split':
+        T = kinetic_spectrum(x, mass, hbar)
+        return lambda psi: dst(T*dst(psi, type=1, norm='ortho'), type=1, norm='ortho') \
+                           + potential*psi
+    if method == 'cn':
+        H = hamiltonian_sparse(x, potential, mass, hbar)
+        return lambda psi: H @ psi
+    raise ValueError("未知的傳播方式: %s" % method)
+
+class Observables:
+    """
+    依序記錄每一次輸出的時間、範數sum |psi|^2 h、<x>與能量<H>，
+    可直接當作propagate的sink。陣列在建立時就配置count個，
+    超過count個的輸出會被忽略，因此記憶體用量與步數無關。
+    hamiltonian為hamiltonian_operator傳回的函數，None時不計算能量。
+    density為另一個sink(例如heatconduction_transient.SnapshotFile)，
+    會收到包含兩端的機率密度|psi|^2(N+2個點)。
+    """
+    def __init__(self, x, count, hamiltonian=None, density=None):
+        self.x = x
+        self.h = x[1]-x[0]
+        self.hamiltonian = hamiltonian
+        self.density = density
+        self.t = np.zeros(count)
+        self.norm = np.zeros(count)
+        self.mean_x = np.zeros(count)
+        self.energy = np.zeros(count)
+        self.count = 0
+
+    def __call__(self, n, t, psi):
+        rho = np.abs(psi)**2
+        if self.count < len(self.t):
+            i = self.count
+            self.t[i] = t
+            self.norm[i] = np.sum(rho)*self.h
+            self.mean_x[i] = np.sum(self.x*rho)*self.h/self.norm[i]
+            if self.hamiltonian is not None:
+                self.energy[i] = np.real(np.vdot(psi, self.hamiltonian(psi)))*self.h/self.norm[i]
+            self.count += 1
+        if self.density is not None:
+            self.density(n, t, np.pad(rho, 1))
+
+def propagate(x, V, psi0, dt, steps, method='split', mass=electron_mass, hbar=hbar,
+              observe_every=0, sink=None):
+    """
+    從psi0開始傳播steps步，每步dt秒。x、V與solve_schrodinger相同，
+    method為'split'(Strang分裂 exp(-iV dt/2hbar) exp(-iT dt/hbar) exp(-iV dt/2hbar))
+    或'cn'(Crank-Nicolson，(I + iH dt/2hbar) psi(n+1) = (I - iH dt/2hbar) psi(n))。
+    每observe_every步(以及第0步)呼叫一次sink(n, t, psi)，sink可為Observables；
+    psi為內部計算用的陣列，若要保留需自行複製。observe_every為0時不輸出。
+    傳回最後的波函數與時間。
+    """
+    x = np.asarray(x, dtype=float)
+    potential = V(x) if callable(V) else np.asarray(V, dtype=float)
+    psi = np.array(psi0, dtype=complex)
+    every = observe_every if observe_every and sink is not None else steps
+    if sink is not None and observe_every:
+        sink(0, 0.0, psi)
+    if method == 'split':
+        half = np.exp(-0.5j*potential*dt/hbar)
+        full = half**2
+        kinetic = np.exp(-1j*kinetic_spectrum(x, mass, hbar)*dt/hbar)
+    elif method == 'cn':
+        H = hamiltonian_sparse(x, potential, mass, hbar)
+        A = (identity(len(x)) + 0.5j*dt/hbar*H).tocsc()
+        B = (identity(len(x)) - 0.5j*dt/hbar*H).tocsr()
+        lu = splu(A, permc_spec='NATURAL') # 三對角矩陣不需要重新排列，也不會有fill-in
+    else:
+        raise ValueError("未知的傳播方式: %s" % method)
+    n = 0
+    while n < steps:
+        m = min(every, steps-n)
+        if method == 'split':
+            # 相鄰兩步的位能半步合併成一步，只在輸出前後做半步
+            psi *= half
+            for i in range(m):
+                psi = dst(kinetic*dst(psi, type=1, norm='ortho'), type=1, norm='ortho')
+                psi *= full if i < m-1 else half
+        else:
+            for i in range(m):
+                psi = lu.solve(B @ psi)
+        n += m
+        if sink is not None and observe_every:
+            sink(n, n*dt, psi)
+    return psi, n*dt
+
+if __name__ == '__main__':
+    from scipy.constants import eV, nano, femto
+    # 與potential_well_out_of_box.py相同的方形井，位能反過來即為寬1nm、高0.3eV的位障
+    x = np.linspace(-200*nano, 200*nano, 2047) # N+1 = 2^11，DST最快
+    barrier = lambda x: 0.3*eV - square_well(1*nano, 0.3*eV)(x)
+    E0 = 0.2*eV # 波包的平均能量，低於位障
+    k0 = np.sqrt(2*electron_mass*E0)/hbar
+    psi0 = gaussian_packet(x, -60*nano, 10*nano, k0)
+    dt, steps, every = 0.005*femto, 10**5, 100
+
+    fig, axs = plt.subplots(2, 1, figsize=(7, 7))
+    for method in ('split', 'cn'):
+        log = Observables(x, steps//every+1, hamiltonian_operator(x, barrier, method))
+        psi, t = propagate(x, barrier, psi0, dt, steps, method=method,
+                           observe_every=every, sink=log)
+        transmitted = np.sum(np.abs(psi[x > 0])**2)*(x[1]-x[0])
+        print("%s：t=%g fs，穿透機率%.4f，範數的最大變化%.2e，能量的最大變化%.2e eV"
+              % (method, t/femto, transmitted, np.ptp(log.norm[:log.count]),
+                 np.ptp(log.energy[:log.count])/eV))
+        axs[0].plot(x/nano, np.abs(psi)**2*nano, label=method)
+        axs[1].plot(log.t[:log.count]/femto, log.mean_x[:log.count]/nano, label=method)
+    axs[0].plot(x/nano, barrier(x)/eV*np.max(np.abs(psi0)**2)*nano, 'k--', label='V (scaled)')
+    axs[0].set_xlabel('x (nm)')
+    axs[0].set_ylabel(r'$|\psi|^2$ (1/nm)')
+    axs[1].set_xlabel('t (fs)')
+    axs[1].set_ylabel(r'$\langle x \rangle$ (nm)')
+    axs[0].legend()
+    axs[1].legend()
+    plt.show()
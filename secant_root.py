@@ -4,6 +4,7 @@
     註: 如果兩個整數之間有超過一個根，那這支沒辦法解。
     Chang Kai-Po @ Jian Lab 2023/03/03
 """
+from instrument import instrument
 
 def test_case (x):  #用來測試的函數
     y = x**4 + x**3 - 2*x**2 + x - 6
@@ -36,6 +37,7 @@ def one_root (f, i, epsilon):
             low = mid;                 #中間值變成下界
     return mid                         #以下界為根 
 
+@instrument(count='f')
 def all_root (f, low, high, epsilon):
     """
       以low為下界, high為上界，搜尋函數f(x)在這個範圍內可能的根，
@@ -50,5 +52,6 @@ def all_root (f, low, high, epsilon):
         li.append(one_root (f, item, epsilon))
     return li
 
-print("函數 x^4 + x^3 - 2*x^2 + x - 6 \n 在-20與20之間的根可能有:\n");
-print(all_root(test_case, -20, 20, 0.0001))
\ No newline at end of file
+if __name__ == '__main__':
+    print("函數 x^4 + x^3 - 2*x^2 + x - 6 \n 在-20與20之間的根可能有:\n");
+    print(all_root(test_case, -20, 20, 0.0001))
\ No newline at end of file
@@ -15,13 +15,22 @@
     Created by Chang Kai-Po @ Jian Lab, 2023/3/19
 """
 import math
+from instrument import instrument
+from jit_kernels import run
 
 def f(x):
     """ 目標函數 """
     return math.sin(x)
 
-def simpson (f,a,b,n):
-    """ 辛普森積分的計算 """
+@instrument(count='f')
+def simpson (f,a,b,n,jit=False):
+    """ 辛普森積分的計算，jit=True時以numba編譯迴圈與f(見jit_kernels) """
+    if jit:
+        a, b = float(a), float(b)
+    return run(simpson_loop,f,a,b,n,jit=jit)
+
+def simpson_loop (f,a,b,n):
+    """ simpson的迴圈 """
     h = (b-a)/n
     s = f(a)+f(b) #邊界條件
     for i in range(1,n,2): #奇數項
@@ -10,12 +10,15 @@
 
 import numpy as np
 from matplotlib import pyplot as plt    
+from instrument import instrument
 
+@instrument(count='f')
 def gauss(f, a, b, n):
     """高斯積分"""
     x, w = np.polynomial.legendre.leggauss(n)
     return (b - a) / 2 * np.sum(w * f((b - a) / 2 * x + (b + a) / 2))
 
+@instrument(count='f')
 def simpson(f, a, b, n):
     """辛普森積分"""
     h = (b - a) / n
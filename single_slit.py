@@ -7,7 +7,7 @@
 import numpy as np 
 from scipy.constants import milli, nano, c, pi
 from scipy.integrate import quad #使用一般數值積分
-from matplotlib import pyplot as plt
+from plotting import plot, show
 
 def slit_intensity (L, y, wavelength, d):
     """
@@ -31,8 +31,8 @@ def main():
     z = np.zeros(1000)
     for i in range(1000):
         z[i] = slit_intensity(2, y[i], 630, 0.1)       
-    plt.plot(y, z)
-    plt.show()
+    plot(y, z)
+    show()
     
 if __name__ == '__main__':
     main()
\ No newline at end of file